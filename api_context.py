@@ -0,0 +1,76 @@
+import threading
+
+from api_metrics import ApiMetrics
+from transport import LiveTransport
+
+class ApiContext:
+    # Contexts shared by every ProgramBase instance using the same spreadsheet
+    _contexts = {}
+    _lock = threading.Lock()
+    # Builds the API clients, swapped for a recording/replay/fake transport
+    # to run offline or capture a run
+    transport = LiveTransport()
+    # Every HTTP request made by any context's clients in the run
+    metrics = ApiMetrics()
+
+    def __init__(self, spreadsheet_id:str, creds):
+        """
+        API clients and cached spreadsheet objects for a single spreadsheet.
+        Each context has its own gspread client and discovery service so
+        programs on different spreadsheets can run concurrently, both are
+        built over the transport's shared session and connection pool
+
+        Args:
+            spreadsheet_id (str): Spreadsheet the context belongs to
+            creds (ServiceAccountCredentials): Google API credentials, None
+                when the transport doesn't need them
+        """
+        print(f"Initialising API context for {spreadsheet_id}")
+        self.spreadsheet_id = spreadsheet_id
+        self.creds = creds
+
+        self.service, self.gc = self.transport.build_clients(creds, self.metrics)
+
+        self.g_sheet = None  # gspread Spreadsheet, loaded on first use
+        self.metadata = None  # SpreadsheetMetadata snapshot, loaded on first use
+        self.worksheets = None  # All worksheets list
+        self.worksheet_dict = {}  # Worksheets as dict {name: worksheet}
+        self.request_buffer = None  # Queued batchUpdate requests {"requests": [], "max_requests": int}
+
+    @classmethod
+    def for_spreadsheet(cls, spreadsheet_id:str, verify_user):
+        """
+        Get the context for a spreadsheet, creating it on first use
+
+        Args:
+            spreadsheet_id (str): Spreadsheet ID
+            verify_user (callable): Returns credentials for a new context
+        """
+        with cls._lock:
+            context = cls._contexts.get(spreadsheet_id)
+        if context is not None:
+            return(context)
+
+        # Build clients outside the lock so other spreadsheets aren't held up
+        creds = verify_user() if cls.transport.needs_credentials else None
+        context = cls(spreadsheet_id, creds)
+        with cls._lock:
+            return(cls._contexts.setdefault(spreadsheet_id, context))
+
+    @classmethod
+    def release(cls, spreadsheet_id:str):
+        """Drop a spreadsheet's clients and caches once its program has finished."""
+        with cls._lock:
+            cls._contexts.pop(spreadsheet_id, None)
+
+    @classmethod
+    def use_transport(cls, transport:LiveTransport):
+        """Build all new contexts' clients with the given transport."""
+        with cls._lock:
+            cls.transport = transport
+            cls._contexts.clear()
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._contexts.clear()
@@ -0,0 +1,93 @@
+from urllib.parse import urlsplit
+import threading
+import bisect
+import re
+
+class ApiMetrics:
+    # Latency histogram bucket upper bounds, milliseconds
+    LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        """
+        Per-endpoint counts, latency histograms, payload sizes and statuses
+        of every HTTP request the gspread and discovery service clients make.
+        Each retry attempt is a separate request. Safe to share between threads
+        """
+        self._lock = threading.Lock()
+        # endpoint:stats
+        self.endpoints = {}
+
+    @staticmethod
+    def endpoint(method:str, url:str) -> str:
+        """
+        Group requests by endpoint rather than spreadsheet or range, e.g.
+        "PUT spreadsheets/values/{range}" or "POST drive/files/{id}/copy"
+        """
+        path = urlsplit(url).path
+        sheets_match = re.match(r"/v4/spreadsheets/[^/:]+(.*)", path)
+        if sheets_match is not None:
+            rest = re.sub(r"^/values/[^:]+", "/values/{range}", sheets_match.group(1))
+            return(f"{method.upper()} spreadsheets{rest}")
+        drive_match = re.match(r"/drive/v3/files/[^/]+(.*)", path)
+        if drive_match is not None:
+            return(f"{method.upper()} drive/files/{{id}}{drive_match.group(1)}")
+        return(f"{method.upper()} {path}")
+
+    def record(self, method:str, url:str, status:int, seconds:float, request_bytes:int, response_bytes:int):
+        endpoint = self.endpoint(method, url)
+        bucket = bisect.bisect_left(self.LATENCY_BUCKETS_MS, seconds*1000)
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "calls": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "latency_ms": [0]*(len(self.LATENCY_BUCKETS_MS) + 1),
+                "request_bytes": 0,
+                "response_bytes": 0,
+                "statuses": {}
+            })
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["latency_ms"][bucket] += 1
+            stats["request_bytes"] += request_bytes
+            stats["response_bytes"] += response_bytes
+            stats["statuses"][str(status)] = stats["statuses"].get(str(status), 0) + 1
+
+    @staticmethod
+    def _size(body) -> int:
+        if body is None:
+            return(0)
+        if isinstance(body, str):
+            return(len(body.encode()))
+        return(len(body))
+
+    def on_response(self, response, *args, **kwargs):
+        """requests response hook for the shared API session"""
+        self.record(
+            response.request.method,
+            response.request.url,
+            response.status_code,
+            response.elapsed.total_seconds(),
+            self._size(response.request.body),
+            self._size(response.content)
+        )
+        return(response)
+
+    def summary(self) -> dict:
+        labels = [f"<={b}" for b in self.LATENCY_BUCKETS_MS] + [f">{self.LATENCY_BUCKETS_MS[-1]}"]
+        with self._lock:
+            return({
+                endpoint: {
+                    **stats,
+                    "seconds": round(stats["seconds"], 3),
+                    "mean_seconds": round(stats["seconds"]/stats["calls"], 3),
+                    "max_seconds": round(stats["max_seconds"], 3),
+                    "latency_ms": dict(zip(labels, stats["latency_ms"])),
+                    "statuses": dict(stats["statuses"])
+                } for endpoint, stats in sorted(self.endpoints.items())
+            })
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return(sum([stats["calls"] for stats in self.endpoints.values()]))
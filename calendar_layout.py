@@ -0,0 +1,93 @@
+from datetime import datetime
+import calendar
+
+from layout_cache import MonthLayout
+from month_grid import MonthGrid
+
+class CalendarLayout(MonthLayout):
+    # TEMPLATE geometry, end rows and columns are exclusive
+    LAST_SESSION_END_COLUMN = 15
+    LAST_ROW = 63
+    # Spare whole weeks are only blanked out when they start above this row
+    SPARE_WEEKS_BEFORE_ROW = 54
+    WEEK_NUMBER_COLUMN = 0
+    TITLE_CELL = (1, 1)
+
+    def __init__(self, month_dt:datetime, session_length:int):
+        """
+        Layout of a month duplicated from the TEMPLATE, worked out from the
+        calendar rather than read from the sheet. Day 1 sits in its
+        weekday's column (weeks run Sunday to Saturday) and every following
+        day follows on, so the anchors and the book-end ranges either side
+        of the month are known before the sheet exists
+
+        Args:
+            month_dt (datetime): Any date in the month
+            session_length (int): Rows per session in the TEMPLATE, including
+                the date header
+        """
+        self.month_dt = datetime(month_dt.year, month_dt.month, 1)
+        super().__init__(
+            day1_column_index=self.day1_column(self.month_dt),
+            session_length=session_length,
+            days_in_month=calendar.monthrange(month_dt.year, month_dt.month)[1]
+        )
+
+    def __repr__(self):
+        return(f"CalendarLayout(month_dt={self.month_dt:%Y-%m}, session_length={self.session_length})")
+
+    @classmethod
+    def day1_column(cls, month_dt:datetime) -> int:
+        """Column of day 1's session, Sunday is the first session column"""
+        first_weekday = calendar.monthrange(month_dt.year, month_dt.month)[0]
+        return(cls.FIRST_SESSION_COLUMN + 2*((first_weekday + 1) % 7))
+
+    @classmethod
+    def template_values(cls, month_dt:datetime) -> list[tuple]:
+        """
+        (row, col, value) written to a fresh copy of the TEMPLATE: day 1,
+        from which the TEMPLATE numbers the other days, the title and the
+        first week number. None of them depend on the session length
+        """
+        month_dt = datetime(month_dt.year, month_dt.month, 1)
+        return([
+            (MonthGrid.FIRST_HEADER_ROW, cls.day1_column(month_dt), 1),
+            (*cls.TITLE_CELL, month_dt.strftime("%B %Y")),
+            (MonthGrid.FIRST_HEADER_ROW + 1, cls.WEEK_NUMBER_COLUMN, int(month_dt.strftime("%V")))
+        ])
+
+    def book_end_ranges(self) -> list[tuple]:
+        """
+        (start_row, end_row, start_col, end_col) of the sessions outside the
+        month: the days before the 1st in the first week, the days after the
+        final day in its week and any whole weeks left below it
+        """
+        ranges = []
+        # Sundays require no removal of prior days
+        if self.day1_column_index != self.FIRST_SESSION_COLUMN:
+            ranges.append((
+                MonthGrid.FIRST_HEADER_ROW,
+                MonthGrid.FIRST_HEADER_ROW + self.session_length,
+                self.FIRST_SESSION_COLUMN,
+                self.day1_column_index
+            ))
+
+        # If the final day is a Saturday there's nothing after it that week
+        final_row, final_col = self.anchors[self.days_in_month]
+        if final_col + 2 < self.LAST_SESSION_END_COLUMN:
+            ranges.append((
+                final_row,
+                final_row + self.session_length,
+                final_col + 2,
+                self.LAST_SESSION_END_COLUMN
+            ))
+
+        spare_row = final_row + self.session_length
+        if spare_row < self.SPARE_WEEKS_BEFORE_ROW:
+            ranges.append((
+                spare_row,
+                self.LAST_ROW,
+                self.FIRST_SESSION_COLUMN,
+                self.LAST_SESSION_END_COLUMN
+            ))
+        return(ranges)
@@ -0,0 +1,107 @@
+from urllib.parse import urlsplit, parse_qsl
+import threading
+import json
+import os
+
+class CassetteMiss(KeyError):
+    """Raised when a replayed request wasn't recorded in the cassette."""
+
+class Cassette:
+    # Query parameters that differ between otherwise identical requests
+    IGNORED_PARAMS = ("access_token", "key", "prettyPrint")
+
+    def __init__(self, path:str):
+        """
+        Recorded Sheets/Drive requests and responses for a run. Interactions
+        are replayed in recorded order per request, so a replay of the same
+        run gets the same responses even if requests to different endpoints
+        interleave differently (e.g. programs run on several threads)
+
+        Args:
+            path (str): Cassette JSON file
+        """
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+        # request_key:[unplayed interactions], built on first replay
+        self._unplayed = None
+
+    @classmethod
+    def load(cls, path:str) -> "Cassette":
+        cassette = cls(path)
+        with open(path) as cassette_file:
+            cassette.interactions = json.load(cassette_file)["interactions"]
+        print(f"Loaded {len(cassette.interactions)} recorded API calls from {path}")
+        return(cassette)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            with open(self.path, "w") as cassette_file:
+                json.dump({"interactions": self.interactions}, cassette_file, indent=1)
+        print(f"Saved {len(self.interactions)} recorded API calls to {self.path}")
+
+    @staticmethod
+    def canonical_body(body):
+        """JSON bodies are compared on content rather than formatting."""
+        if body is None or body == b"" or body == "":
+            return(None)
+        if isinstance(body, (dict, list)):
+            return(json.dumps(body, sort_keys=True))
+        if isinstance(body, bytes):
+            body = body.decode()
+        try:
+            return(json.dumps(json.loads(body), sort_keys=True))
+        except ValueError:
+            return(body)
+
+    @classmethod
+    def request_key(cls, method:str, url:str, params=None, body=None) -> str:
+        """
+        Identify a request by method, URL path, query parameters (from the
+        URL and params combined, in sorted order) and body
+        """
+        split_url = urlsplit(url)
+        query = parse_qsl(split_url.query, keep_blank_values=True)
+        for name, value in (params or {}).items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            query.extend([(name, str(v)) for v in values])
+        query = sorted([(k, v) for k, v in query if k not in cls.IGNORED_PARAMS])
+
+        return(json.dumps([
+            method.upper(),
+            f"{split_url.netloc}{split_url.path}",
+            query,
+            cls.canonical_body(body)
+        ]))
+
+    def record(self, method:str, url:str, params, body, status:int, headers:dict, content:bytes):
+        interaction = {
+            "key": self.request_key(method, url, params, body),
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "headers": {k.lower(): v for k, v in headers.items() if k.lower() in ("content-type", "retry-after")},
+            "content": content.decode() if isinstance(content, bytes) else content
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def play(self, method:str, url:str, params=None, body=None) -> tuple[int, dict, bytes]:
+        """
+        Returns:
+            tuple[int, dict, bytes]: Recorded status, headers and content
+        """
+        key = self.request_key(method, url, params, body)
+        with self._lock:
+            if self._unplayed is None:
+                self._unplayed = {}
+                for interaction in self.interactions:
+                    self._unplayed.setdefault(interaction["key"], []).append(interaction)
+
+            unplayed = self._unplayed.get(key, [])
+            if unplayed == []:
+                raise CassetteMiss(f"No recorded response for {method.upper()} {url}")
+            interaction = unplayed.pop(0)
+
+        return((interaction["status"], interaction["headers"], interaction["content"].encode()))
@@ -0,0 +1,73 @@
+import threading
+import json
+import os
+
+# Trimmed Sheets v4 discovery document, regenerate with `python discovery.py`
+DISCOVERY_PATH = os.path.join("data", "discovery_sheets_v4.json")
+# Discovery service methods kept in the trimmed document, resource_path:methods
+METHODS = {
+    "spreadsheets": ("get", "batchUpdate"),
+    "spreadsheets.values": ("get", "batchGet", "update", "batchUpdate", "clear")
+}
+
+_document = None
+_lock = threading.Lock()
+
+def trim_document(document:dict) -> dict:
+    """
+    Keep only the methods in METHODS, without descriptions and with empty
+    request/response schemas. Building each resource then skips generating
+    docstrings from the (very large) Spreadsheet schema, which costs around
+    half a second per service. Bodies and responses are still plain JSON
+    """
+    trimmed = {k: v for k, v in document.items() if k not in ("resources", "schemas", "description", "icons")}
+    trimmed["schemas"] = {}
+    trimmed["resources"] = {}
+
+    for resource_path, method_names in METHODS.items():
+        source = document
+        target = trimmed
+        for name in resource_path.split("."):
+            source = source["resources"][name]
+            target = target.setdefault("resources", {}).setdefault(name, {})
+        methods = target.setdefault("methods", {})
+        for method_name in method_names:
+            method = dict(source["methods"][method_name])
+            method.pop("description", None)
+            for schema_key in ("request", "response"):
+                if schema_key in method:
+                    schema_name = method[schema_key]["$ref"]
+                    trimmed["schemas"][schema_name] = {"id": schema_name, "type": "object"}
+            method["parameters"] = {
+                name: {k: v for k, v in parameter.items() if k != "description"}
+                for name, parameter in method.get("parameters", {}).items()
+            }
+            methods[method_name] = method
+
+    return(trimmed)
+
+def load_document() -> str:
+    """Trimmed discovery document, read from disk once per process"""
+    global _document
+    with _lock:
+        if _document is None:
+            with open(DISCOVERY_PATH) as document_file:
+                _document = document_file.read()
+        return(_document)
+
+def build_service(http):
+    """
+    Sheets v4 discovery service from the bundled document, never fetches
+    discovery over the network
+    """
+    from googleapiclient.discovery import build_from_document
+    return(build_from_document(load_document(), http=http))
+
+if __name__ == "__main__":
+    # Regenerate the trimmed document from the one bundled with googleapiclient
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = trim_document(json.loads(get_static_doc("sheets", "v4")))
+    with open(DISCOVERY_PATH, "w") as document_file:
+        json.dump(document, document_file, indent=1, sort_keys=True)
+    print(f"Wrote Sheets v4 discovery document (revision {document['revision']}) to {DISCOVERY_PATH}")
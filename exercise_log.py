@@ -0,0 +1,68 @@
+import pandas as pd
+
+class ExerciseLog:
+    COLUMNS = ("Date", "Exercise", "Result")
+
+    def __init__(self):
+        """
+        Accumulate exercise results into column buffers so the log DataFrame
+        is only built once, rather than concatenating a new row per exercise
+        """
+        self.columns = {c: [] for c in self.COLUMNS}
+        # month_sheet_name : number of rows logged from that month
+        self.month_row_counts = {}
+
+    def __len__(self):
+        return(len(self.columns["Date"]))
+
+    def add_row(self, date, exercise:str, result):
+        self.columns["Date"].append(date)
+        self.columns["Exercise"].append(exercise)
+        self.columns["Result"].append(result)
+
+    def add_month(self, month_name:str, month_sessions:list) -> int:
+        """
+        Add every valid exercise from a month's sessions to the column buffers
+
+        Args:
+            month_name (str): Month sheet name, used for the row counts
+            month_sessions (list): Session objects built by Month
+
+        Returns:
+            int: Number of rows added for the month
+        """
+        rows_before = len(self)
+        for session in month_sessions:
+            # Not empty and not a rest day
+            if not session.status["is_valid"]:
+                continue
+            for ex, result in session.exercises.items():
+                # Skipped exercise block
+                if ex == "" or ex == "meta":
+                    continue
+                self.add_row(session.date, ex, result)
+
+        self.month_row_counts[month_name] = len(self) - rows_before
+        return(self.month_row_counts[month_name])
+
+    def build(self, legacy_df:pd.DataFrame=None) -> pd.DataFrame:
+        """
+        Create the log DataFrame in one step, placing legacy rows first and
+        sorting by date with a stable sort so same-day rows keep their order
+
+        Args:
+            legacy_df (pd.DataFrame, optional): Legacy logs already renamed to
+                Date, Exercise, Result. Defaults to None.
+        """
+        month_df = pd.DataFrame(self.columns, columns=list(self.COLUMNS))
+
+        if legacy_df is None or legacy_df.empty:
+            log_df = month_df
+        elif month_df.empty:
+            log_df = legacy_df
+        else:
+            log_df = pd.concat([legacy_df, month_df], ignore_index=True)
+
+        return(
+            log_df.sort_values(["Date"], kind="stable").reset_index(drop=True)
+        )
@@ -0,0 +1,441 @@
+from urllib.parse import urlsplit, unquote, parse_qs
+from datetime import datetime, timedelta, timezone
+from gspread.utils import a1_range_to_grid_range
+import threading
+import calendar
+import copy
+import json
+import re
+
+class FakeSheets:
+    # Deterministic Drive modifiedTime, bumped on every change
+    EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # Sheet whose copies number their days from day 1, as its formulas would
+    TEMPLATE_TITLE = "TEMPLATE"
+    # Row of the first week's date headers (0 indexed)
+    FIRST_HEADER_ROW = 3
+
+    def __init__(self, spreadsheets:dict=None):
+        """
+        In-memory stand-in for the Sheets and Drive endpoints the program
+        uses, so full runs can be timed without network access or quota.
+        Only values are stored (as their formatted strings), formulas aren't
+        evaluated and formatting requests are accepted but not applied. The
+        TEMPLATE's day formulas are the one exception: once day 1 is written
+        to a copy of it, the rest of the month's days are numbered from it
+
+        Args:
+            spreadsheets (dict, optional): spreadsheet_id:{"title": str, "sheets": [
+                {"properties": {...}, "merges": [...], "conditionalFormats": [...], "values": [[...]]}
+            ]}. Defaults to None.
+        """
+        self.spreadsheets = copy.deepcopy(spreadsheets or {})
+        self._lock = threading.Lock()
+        self._revision = 0
+        for spreadsheet_id in self.spreadsheets:
+            self._touch(spreadsheet_id)
+
+        # (method, url pattern, handler) matched against "host/path"
+        self.routes = [
+            ("GET", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)", self.get_spreadsheet),
+            ("POST", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+):batchUpdate", self.batch_update),
+            ("GET", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)/values:batchGet", self.values_batch_get),
+            ("POST", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)/values:batchUpdate", self.values_batch_update),
+            ("POST", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)/values/(.+):clear", self.values_clear),
+            ("GET", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)/values/(.+)", self.values_get),
+            ("PUT", r"sheets\.googleapis\.com/v4/spreadsheets/([^/:]+)/values/(.+)", self.values_update),
+            ("GET", r"www\.googleapis\.com/drive/v3/files/([^/]+)", self.get_file),
+            ("POST", r"www\.googleapis\.com/drive/v3/files/([^/]+)/copy", self.copy_file),
+            ("GET", r"www\.googleapis\.com/drive/v3/files/([^/]+)/permissions", self.list_permissions),
+            ("GET", r"www\.googleapis\.com/drive/v3/files/([^/]+)/comments", self.list_comments),
+        ]
+
+    @classmethod
+    def load(cls, path:str) -> "FakeSheets":
+        with open(path) as fixture_file:
+            return(cls(json.load(fixture_file)))
+
+    def save(self, path:str):
+        with self._lock:
+            with open(path, "w") as fixture_file:
+                json.dump(self.spreadsheets, fixture_file, indent=1)
+
+    def handle(self, method:str, url:str, params=None, body=None) -> tuple[int, dict, bytes]:
+        """
+        Serve a Sheets/Drive request
+
+        Returns:
+            tuple[int, dict, bytes]: Response status, headers and JSON content
+        """
+        split_url = urlsplit(url)
+        path = f"{split_url.netloc}{split_url.path}"
+        query = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(split_url.query).items()}
+        query.update(params or {})
+        if isinstance(body, bytes):
+            body = body.decode()
+        if isinstance(body, str):
+            body = json.loads(body) if body else None
+
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method.upper() and match is not None:
+                args = [unquote(group) for group in match.groups()]
+                try:
+                    with self._lock:
+                        return(self._response(200, handler(*args, params=query, body=body)))
+                except KeyError as e:
+                    return(self._response(404, {"error": {"code": 404, "message": f"Not found: {e}", "status": "NOT_FOUND"}}))
+                except ValueError as e:
+                    return(self._response(400, {"error": {"code": 400, "message": str(e), "status": "INVALID_ARGUMENT"}}))
+
+        return(self._response(404, {"error": {"code": 404, "message": f"Unsupported request {method} {path}", "status": "NOT_FOUND"}}))
+
+    @staticmethod
+    def _response(status:int, content:dict) -> tuple[int, dict, bytes]:
+        return((status, {"content-type": "application/json; charset=UTF-8"}, json.dumps(content).encode()))
+
+    def _touch(self, spreadsheet_id:str):
+        self._revision += 1
+        modified_time = self.EPOCH + timedelta(seconds=self._revision)
+        self.spreadsheets[spreadsheet_id]["modifiedTime"] = modified_time.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    def _sheets(self, spreadsheet_id:str) -> list:
+        return(self.spreadsheets[spreadsheet_id]["sheets"])
+
+    def _sheet_by_id(self, spreadsheet_id:str, sheet_id:int) -> dict:
+        for sheet in self._sheets(spreadsheet_id):
+            if sheet["properties"]["sheetId"] == sheet_id:
+                return(sheet)
+        raise KeyError(f"sheetId {sheet_id}")
+
+    def _sheet_by_title(self, spreadsheet_id:str, title:str) -> dict:
+        for sheet in self._sheets(spreadsheet_id):
+            if sheet["properties"]["title"] == title:
+                return(sheet)
+        raise KeyError(f"sheet {title}")
+
+    def _reindex(self, spreadsheet_id:str):
+        for index, sheet in enumerate(self._sheets(spreadsheet_id)):
+            sheet["properties"]["index"] = index
+
+    ### --- Values --- ###
+
+    def _parse_range(self, spreadsheet_id:str, a1_range:str) -> tuple[dict, dict]:
+        """
+        Split an A1 range ("'Jan 24'!A1:C3", "Jan 24", "A1:C3") into its sheet
+        and a half open grid range, unbounded ends are left out
+        """
+        titles = [s["properties"]["title"] for s in self._sheets(spreadsheet_id)]
+        if "!" in a1_range:
+            title, cells = a1_range.rsplit("!", 1)
+        # A sheet's title wins over an A1 range, e.g. "TEMPLATE" isn't a column
+        elif a1_range in titles or a1_range.strip("'") in titles:
+            title, cells = a1_range, ""
+        elif re.fullmatch(r"[A-Z]*[0-9]*(:[A-Z]*[0-9]*)?", a1_range) and a1_range != "":
+            title, cells = None, a1_range
+        else:
+            title, cells = a1_range, ""
+
+        if title is None:
+            sheet = self._sheets(spreadsheet_id)[0]
+        else:
+            if title.startswith("'") and title.endswith("'"):
+                title = title[1:-1].replace("''", "'")
+            sheet = self._sheet_by_title(spreadsheet_id, title)
+
+        grid_range = a1_range_to_grid_range(cells) if cells else {}
+        return(sheet, grid_range)
+
+    @staticmethod
+    def _trim(values:list) -> list:
+        """Drop trailing empty cells and rows as the API does."""
+        trimmed = []
+        for row in values:
+            row = list(row)
+            while row and row[-1] == "":
+                row.pop()
+            trimmed.append(row)
+        while trimmed and trimmed[-1] == []:
+            trimmed.pop()
+        return(trimmed)
+
+    @staticmethod
+    def format_value(value) -> str:
+        if isinstance(value, bool):
+            return("TRUE" if value else "FALSE")
+        if isinstance(value, float) and value.is_integer():
+            return(str(int(value)))
+        if value is None:
+            return("")
+        return(str(value))
+
+    def _read(self, sheet:dict, grid_range:dict) -> list:
+        values = sheet.setdefault("values", [])
+        start_row = grid_range.get("startRowIndex", 0)
+        end_row = grid_range.get("endRowIndex", len(values))
+        start_col = grid_range.get("startColumnIndex", 0)
+        end_col = grid_range.get("endColumnIndex")
+        return(self._trim([row[start_col:end_col] for row in values[start_row:end_row]]))
+
+    def _write(self, sheet:dict, start_row:int, start_col:int, rows:list) -> int:
+        values = sheet.setdefault("values", [])
+        updated = 0
+        for r, row in enumerate(rows):
+            row_index = start_row + r
+            while len(values) <= row_index:
+                values.append([])
+            for c, value in enumerate(row):
+                col_index = start_col + c
+                while len(values[row_index]) <= col_index:
+                    values[row_index].append("")
+                values[row_index][col_index] = self.format_value(value)
+                updated += 1
+
+        # The API would reject writes outside the grid, grow it rather than lose values
+        grid = sheet["properties"].setdefault("gridProperties", {})
+        grid["rowCount"] = max(grid.get("rowCount", 0), len(values))
+        grid["columnCount"] = max(grid.get("columnCount", 0), max([len(row) for row in values] + [0]))
+        return(updated)
+
+    def _clear(self, sheet:dict, grid_range:dict):
+        values = sheet.setdefault("values", [])
+        end_row = min(grid_range.get("endRowIndex", len(values)), len(values))
+        for row in values[grid_range.get("startRowIndex", 0):end_row]:
+            end_col = min(grid_range.get("endColumnIndex", len(row)), len(row))
+            for col in range(grid_range.get("startColumnIndex", 0), end_col):
+                row[col] = ""
+
+    def _value_range(self, spreadsheet_id:str, a1_range:str) -> dict:
+        sheet, grid_range = self._parse_range(spreadsheet_id, a1_range)
+        value_range = {"range": a1_range, "majorDimension": "ROWS"}
+        values = self._read(sheet, grid_range)
+        if values:
+            value_range["values"] = values
+        return(value_range)
+
+    def values_get(self, spreadsheet_id:str, a1_range:str, params:dict, body) -> dict:
+        return(self._value_range(spreadsheet_id, a1_range))
+
+    def values_batch_get(self, spreadsheet_id:str, params:dict, body) -> dict:
+        ranges = params.get("ranges", [])
+        ranges = [ranges] if isinstance(ranges, str) else ranges
+        return({
+            "spreadsheetId": spreadsheet_id,
+            "valueRanges": [self._value_range(spreadsheet_id, r) for r in ranges]
+        })
+
+    def _update_range(self, spreadsheet_id:str, a1_range:str, values:list) -> dict:
+        sheet, grid_range = self._parse_range(spreadsheet_id, a1_range)
+        updated = self._write(
+            sheet, grid_range.get("startRowIndex", 0), grid_range.get("startColumnIndex", 0), values
+        )
+        return({
+            "spreadsheetId": spreadsheet_id,
+            "updatedRange": a1_range,
+            "updatedRows": len(values),
+            "updatedColumns": max([len(row) for row in values] + [0]),
+            "updatedCells": updated
+        })
+
+    def values_update(self, spreadsheet_id:str, a1_range:str, params:dict, body) -> dict:
+        response = self._update_range(spreadsheet_id, a1_range, body.get("values", []))
+        self._touch(spreadsheet_id)
+        return(response)
+
+    def values_batch_update(self, spreadsheet_id:str, params:dict, body) -> dict:
+        responses = [self._update_range(spreadsheet_id, d["range"], d.get("values", [])) for d in body.get("data", [])]
+        self._touch(spreadsheet_id)
+        return({
+            "spreadsheetId": spreadsheet_id,
+            "totalUpdatedCells": sum([r["updatedCells"] for r in responses]),
+            "responses": responses
+        })
+
+    def values_clear(self, spreadsheet_id:str, a1_range:str, params:dict, body) -> dict:
+        sheet, grid_range = self._parse_range(spreadsheet_id, a1_range)
+        self._clear(sheet, grid_range)
+        self._touch(spreadsheet_id)
+        return({"spreadsheetId": spreadsheet_id, "clearedRange": a1_range})
+
+    ### --- Spreadsheet metadata and batchUpdate --- ###
+
+    def get_spreadsheet(self, spreadsheet_id:str, params:dict, body) -> dict:
+        # Cell data is never requested, so the fields mask doesn't need applying
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+        return({
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": spreadsheet.get("title", spreadsheet_id), "locale": "en_GB", "timeZone": "Europe/London"},
+            "sheets": [
+                {k: copy.deepcopy(v) for k, v in sheet.items() if k not in ("values", "daySlots")}
+                for sheet in self._sheets(spreadsheet_id)
+            ]
+        })
+
+    def batch_update(self, spreadsheet_id:str, params:dict, body) -> dict:
+        # All or nothing as in the API, requests are applied to a copy that
+        # only replaces the spreadsheet once every request has succeeded
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+        self.spreadsheets[spreadsheet_id] = copy.deepcopy(spreadsheet)
+        replies = []
+        try:
+            for request in body.get("requests", []):
+                (request_type, request_body), = request.items()
+                apply_request = getattr(self, f"apply_{request_type}", None)
+                if apply_request is None:
+                    raise ValueError(f"Unsupported batchUpdate request: {request_type}")
+                replies.append(apply_request(spreadsheet_id, request_body) or {})
+        except Exception:
+            self.spreadsheets[spreadsheet_id] = spreadsheet
+            raise
+        self._touch(spreadsheet_id)
+        return({"spreadsheetId": spreadsheet_id, "replies": replies})
+
+    def apply_duplicateSheet(self, spreadsheet_id:str, request:dict) -> dict:
+        sheets = self._sheets(spreadsheet_id)
+        new_sheet = copy.deepcopy(self._sheet_by_id(spreadsheet_id, request["sourceSheetId"]))
+        new_sheet_id = request.get("newSheetId")
+        if new_sheet_id is None:
+            new_sheet_id = max([s["properties"]["sheetId"] for s in sheets]) + 1
+        if any([s["properties"]["sheetId"] == new_sheet_id for s in sheets]):
+            raise ValueError(f"sheetId {new_sheet_id} already exists")
+
+        new_sheet["properties"]["sheetId"] = new_sheet_id
+        if new_sheet["properties"]["title"] == self.TEMPLATE_TITLE:
+            new_sheet["daySlots"] = self._day_slots(new_sheet)
+        new_sheet["properties"]["title"] = request.get("newSheetName", f"Copy of {new_sheet['properties']['title']}")
+        for merge in new_sheet.get("merges", []):
+            merge["sheetId"] = new_sheet_id
+        for rule in new_sheet.get("conditionalFormats", []):
+            for grid_range in rule.get("ranges", []):
+                grid_range["sheetId"] = new_sheet_id
+
+        sheets.insert(request.get("insertSheetIndex", len(sheets)), new_sheet)
+        self._reindex(spreadsheet_id)
+        return({"duplicateSheet": {"properties": copy.deepcopy(new_sheet["properties"])}})
+
+    def apply_updateSheetProperties(self, spreadsheet_id:str, request:dict):
+        properties = request["properties"]
+        sheet = self._sheet_by_id(spreadsheet_id, properties["sheetId"])
+        for key, value in properties.items():
+            if isinstance(value, dict):
+                sheet["properties"].setdefault(key, {}).update(value)
+            elif key != "sheetId":
+                sheet["properties"][key] = value
+
+        # Resizing drops values outside the grid
+        grid = sheet["properties"].get("gridProperties", {})
+        values = sheet.setdefault("values", [])
+        del values[grid.get("rowCount", len(values)):]
+        for row in values:
+            del row[grid.get("columnCount", len(row)):]
+
+    def apply_updateCells(self, spreadsheet_id:str, request:dict):
+        if "start" in request:
+            start = request["start"]
+            sheet_id, start_row, start_col = start["sheetId"], start.get("rowIndex", 0), start.get("columnIndex", 0)
+        else:
+            grid_range = request["range"]
+            sheet_id, start_row, start_col = grid_range["sheetId"], grid_range.get("startRowIndex", 0), grid_range.get("startColumnIndex", 0)
+
+        rows = []
+        for row in request.get("rows", []):
+            row_values = []
+            for cell in row.get("values", []):
+                entered = cell.get("userEnteredValue", {})
+                row_values.append(next(iter(entered.values()), ""))
+            rows.append(row_values)
+        sheet = self._sheet_by_id(spreadsheet_id, sheet_id)
+        self._write(sheet, start_row, start_col, rows)
+
+        # Day 1 written to a copy of the TEMPLATE, number the other days
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                if self.format_value(value) == "1" and [start_row + r, start_col + c] in sheet.get("daySlots", []):
+                    self._number_days(sheet, sheet["daySlots"].index([start_row + r, start_col + c]))
+
+    def _day_slots(self, sheet:dict) -> list:
+        """
+        [row, col] of every date header in the TEMPLATE, in calendar order:
+        the numbered cells in the session columns (every other column after
+        column A's week numbers)
+        """
+        values = sheet.get("values", [])
+        slots = []
+        for row_index in range(self.FIRST_HEADER_ROW, len(values)):
+            for col_index in range(1, len(values[row_index]), 2):
+                if values[row_index][col_index].split(" ")[0].isdigit():
+                    slots.append([row_index, col_index])
+        return(slots)
+
+    def _number_days(self, sheet:dict, day1_slot:int):
+        """Number the days of the sheet's month from day 1's slot, blank the rest"""
+        month_dt = datetime.strptime(sheet["properties"]["title"], "%b %y")
+        days_in_month = calendar.monthrange(month_dt.year, month_dt.month)[1]
+        for slot, (row_index, col_index) in enumerate(sheet["daySlots"]):
+            day = slot - day1_slot + 1
+            self._write(sheet, row_index, col_index, [[day if 1 <= day <= days_in_month else ""]])
+
+    def apply_mergeCells(self, spreadsheet_id:str, request:dict):
+        merge_range = dict(request["range"])
+        sheet = self._sheet_by_id(spreadsheet_id, merge_range["sheetId"])
+        sheet.setdefault("merges", []).append(merge_range)
+
+    def apply_unmergeCells(self, spreadsheet_id:str, request:dict):
+        grid_range = request["range"]
+        sheet = self._sheet_by_id(spreadsheet_id, grid_range["sheetId"])
+        def inside(merge):
+            return(all([
+                merge[f"start{dim}Index"] >= grid_range.get(f"start{dim}Index", 0) and
+                merge[f"end{dim}Index"] <= grid_range.get(f"end{dim}Index", float("inf"))
+                for dim in ("Row", "Column")
+            ]))
+        sheet["merges"] = [m for m in sheet.get("merges", []) if not inside(m)]
+
+    def apply_deleteConditionalFormatRule(self, spreadsheet_id:str, request:dict):
+        sheet = self._sheet_by_id(spreadsheet_id, request["sheetId"])
+        sheet.get("conditionalFormats", []).pop(request["index"])
+
+    def apply_updateConditionalFormatRule(self, spreadsheet_id:str, request:dict):
+        sheet = self._sheet_by_id(spreadsheet_id, request["sheetId"])
+        sheet.get("conditionalFormats", [])[request["index"]] = request["rule"]
+
+    def apply_addConditionalFormatRule(self, spreadsheet_id:str, request:dict):
+        sheet = self._sheet_by_id(spreadsheet_id, request["rule"]["ranges"][0]["sheetId"])
+        rules = sheet.setdefault("conditionalFormats", [])
+        rules.insert(request.get("index", len(rules)), request["rule"])
+
+    # Formatting isn't modelled
+    def apply_repeatCell(self, spreadsheet_id:str, request:dict):
+        pass
+
+    def apply_updateBorders(self, spreadsheet_id:str, request:dict):
+        pass
+
+    def apply_updateDimensionProperties(self, spreadsheet_id:str, request:dict):
+        pass
+
+    ### --- Drive --- ###
+
+    def get_file(self, file_id:str, params:dict, body) -> dict:
+        spreadsheet = self.spreadsheets[file_id]
+        return({
+            "id": file_id,
+            "name": spreadsheet.get("title", file_id),
+            "createdTime": self.EPOCH.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "modifiedTime": spreadsheet["modifiedTime"]
+        })
+
+    def copy_file(self, file_id:str, params:dict, body) -> dict:
+        new_id = f"{file_id}_copy{len(self.spreadsheets)}"
+        self.spreadsheets[new_id] = copy.deepcopy(self.spreadsheets[file_id])
+        self.spreadsheets[new_id]["title"] = (body or {}).get("name", f"Copy of {file_id}")
+        self._touch(new_id)
+        return({"id": new_id, "name": self.spreadsheets[new_id]["title"], "mimeType": "application/vnd.google-apps.spreadsheet"})
+
+    def list_permissions(self, file_id:str, params:dict, body) -> dict:
+        self.spreadsheets[file_id]
+        return({"permissions": []})
+
+    def list_comments(self, file_id:str, params:dict, body) -> dict:
+        self.spreadsheets[file_id]
+        return({"comments": []})
@@ -0,0 +1,171 @@
+from datetime import datetime
+import hashlib
+import json
+import os
+
+class GridCache:
+    CACHE_DIR = 'cache'
+
+    def __init__(self, spreadsheet_id:str, cache_dir:str=None):
+        """
+        On-disk copy of the month grids, merge ranges, grid sizes and sheet
+        IDs for a spreadsheet. The cache is stamped with the Drive modifiedTime
+        of the spreadsheet it was read from, while the stamp matches nothing in
+        the spreadsheet has changed and every cached sheet can be loaded
+        locally. Each sheet also records when it was fetched, once the stamp
+        is stale a month is only reused if it was fetched well after it
+        ended and its sheet ID, merges and grid size still match the
+        spreadsheet metadata, see Sheet.reusable_cached_sheets. Delete the
+        cache file (or run with --refresh_cache) to re-read every sheet
+
+        Args:
+            spreadsheet_id (str): Spreadsheet the cache belongs to
+            cache_dir (str, optional): Directory for cache files. Defaults to CACHE_DIR.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.cache_path = os.path.join(cache_dir or self.CACHE_DIR, f"{spreadsheet_id}.json")
+
+        self.modified_time = None
+        # sheet_title:sheet_id for every sheet in the spreadsheet
+        self.sheet_ids = {}
+        # sheet_title:{"values": list, "merges": list, "grid_size": list, "fetched_at": str}
+        self.sheets = {}
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            print(f"\tIgnoring unreadable grid cache: {self.cache_path}")
+            return
+
+        self.modified_time = cached.get("modified_time")
+        self.sheet_ids = cached.get("sheet_ids", {})
+        self.sheets = cached.get("sheets", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        # Write to a temporary file first so an interrupted run can't corrupt the cache
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({
+                "modified_time": self.modified_time,
+                "sheet_ids": self.sheet_ids,
+                "sheets": self.sheets
+            }, cache_file)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def checksum(values:list) -> str:
+        return(hashlib.sha256(json.dumps(values).encode()).hexdigest())
+
+    def is_current(self, modified_time:str) -> bool:
+        """Whether the spreadsheet is unchanged since the cache was stamped."""
+        return(self.modified_time is not None and self.modified_time == modified_time)
+
+    @property
+    def titles(self) -> list[str]:
+        return(list(self.sheet_ids.keys()))
+
+    def has_sheet(self, sheet_name:str) -> bool:
+        return(sheet_name in self.sheets)
+
+    def get_values(self, sheet_name:str) -> list:
+        return(self.sheets[sheet_name]["values"])
+
+    def get_merges(self, sheet_name:str) -> list:
+        return(self.sheets[sheet_name]["merges"])
+
+    def get_fetched_at(self, sheet_name:str) -> datetime:
+        """When the cached sheet was fetched, None if it wasn't recorded"""
+        fetched_at = self.sheets[sheet_name].get("fetched_at")
+        return(None if fetched_at is None else datetime.fromisoformat(fetched_at))
+
+    def matches_metadata(self, sheet_name:str, sheet_id:int, merges:list, grid_size:tuple) -> bool:
+        """
+        Whether the cached sheet has the same sheet ID, merges and grid size
+        as the spreadsheet metadata. Edits to cell values alone aren't seen,
+        so only sheets that aren't expected to change should be reused on this,
+        see get_fetched_at
+
+        Args:
+            sheet_name (str): Sheet title
+            sheet_id (int): Sheet ID in the metadata
+            merges (list): Sheet merges in the metadata
+            grid_size (tuple): (row_count, column_count) in the metadata
+        """
+        if sheet_name not in self.sheets:
+            return(False)
+        cached = self.sheets[sheet_name]
+        return(
+            self.sheet_ids.get(sheet_name) == sheet_id
+            and cached.get("grid_size") == list(grid_size)
+            # Round trip through JSON so tuples and lists compare the same
+            and cached["merges"] == json.loads(json.dumps(merges))
+        )
+
+    def store(
+        self,
+        modified_time:str,
+        sheet_ids:dict,
+        sheet_values:dict,
+        merged_ranges:dict,
+        grid_sizes:dict,
+        fetched_at:datetime,
+        keep_sheets:list
+    ):
+        """
+        Replace the cache with freshly read sheets, keeping the cached sheets
+        that were reused this run. Other cached sheets are dropped
+
+        Args:
+            modified_time (str): Drive modifiedTime read before the sheets were read
+            sheet_ids (dict): sheet_title:sheet_id for every sheet
+            sheet_values (dict): sheet_title:values for the sheets read
+            merged_ranges (dict): sheet_title:merges for the sheets read
+            grid_sizes (dict): sheet_title:(row_count, column_count) for the sheets read
+            fetched_at (datetime): When the sheets started being read
+            keep_sheets (list): Cached sheets reused this run
+        """
+        sheets = {s: self.sheets[s] for s in keep_sheets if s in self.sheets}
+        for sheet_name, values in sheet_values.items():
+            sheets[sheet_name] = {
+                "values": values,
+                "merges": merged_ranges.get(sheet_name, []),
+                "grid_size": list(grid_sizes[sheet_name]),
+                "fetched_at": fetched_at.isoformat(timespec="seconds")
+            }
+
+        self.modified_time = modified_time
+        self.sheet_ids = dict(sheet_ids)
+        self.sheets = sheets
+        self.save()
+
+    def stamp(self, modified_time:str):
+        """
+        Re-stamp the cache after the run's own writes to sheets that aren't
+        cached (the logs tab), so the next run can still use it. Only safe
+        when the spreadsheet was checked to be unchanged since the run's reads
+        right before writing, see Sheet.grid_cache_unchanged
+        """
+        if self.modified_time is None:
+            return
+        self.modified_time = modified_time
+        self.save()
+
+    def invalidate(self, sheet_names:list=None):
+        """
+        Force the next run to re-check the spreadsheet, re-reading
+        sheet_names (or every sheet) rather than reusing the cached copies
+        """
+        self.modified_time = None
+        if sheet_names is None:
+            self.sheets = {}
+        for sheet_name in sheet_names or []:
+            self.sheets.pop(sheet_name, None)
+        if os.path.isfile(self.cache_path):
+            self.save()
@@ -0,0 +1,88 @@
+from datetime import datetime
+import subprocess
+import statistics
+import argparse
+import json
+import sys
+import os
+import time
+
+# Cold start cases, each run in a fresh interpreter
+CASES = {
+    "help": ["program_update.py", "--help"],
+    "import_program_base": ["-c", "import program_base"],
+    "import_program": ["-c", "import program"],
+    "build_clients": ["-c", (
+        "from transport import OfflineTransport;"
+        "OfflineTransport(lambda *args: (404, {}, b'{}')).build_clients(None)"
+    )],
+}
+HISTORY_PATH = os.path.join("reports", "import_times.json")
+
+def time_case(args:list, repeats:int) -> list:
+    """Wall time of each run of python with args, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return(timings)
+
+def slowest_imports(module:str, count:int=10) -> list:
+    """Modules with the largest cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        imports.append((name, int(cumulative)/1e6))
+    imports.sort(key=lambda i: i[1], reverse=True)
+    return([{"module": name, "seconds": round(seconds, 3)} for name, seconds in imports[:count]])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cold start benchmark, appends the results to the import time history"
+    )
+    parser.add_argument('--repeats', type=int, default=5, help="Fresh interpreters per case")
+    parser.add_argument('--history', default=HISTORY_PATH, help="Results history JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for case, case_args in CASES.items():
+        timings = time_case(case_args, args.repeats)
+        results[case] = {
+            "median_seconds": round(statistics.median(timings), 3),
+            "min_seconds": round(min(timings), 3)
+        }
+
+    history = []
+    if os.path.isfile(args.history):
+        with open(args.history) as history_file:
+            history = json.load(history_file)
+    previous = history[-1]["results"] if history else {}
+
+    for case, result in results.items():
+        line = f"{case:<22} median {result['median_seconds']:.3f}s  min {result['min_seconds']:.3f}s"
+        if case in previous:
+            change = result["median_seconds"] - previous[case]["median_seconds"]
+            line += f"  ({change:+.3f}s since last run)"
+        print(line)
+
+    print("\nSlowest imports for `import program`:")
+    slowest = slowest_imports("program")
+    for entry in slowest:
+        print(f"\t{entry['module']:<40} {entry['seconds']:.3f}s")
+
+    history.append({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "results": results,
+        "slowest_imports": slowest
+    })
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "w") as history_file:
+        json.dump(history, history_file, indent=2)
@@ -0,0 +1,190 @@
+from datetime import datetime
+import threading
+import calendar
+import hashlib
+import json
+import re
+import os
+
+from month_grid import MonthGrid
+
+class MonthLayout:
+    # Column of the first session in the week (Sunday)
+    FIRST_SESSION_COLUMN = 1
+
+    def __init__(self, day1_column_index:int, session_length:int, days_in_month:int):
+        """
+        Geometry of a month sheet: where day 1 is, how many rows each session
+        takes and the anchor (top left cell) of every day's session
+
+        Args:
+            day1_column_index (int): Column of day 1's session
+            session_length (int): Rows per session, including the date header
+            days_in_month (int): Days in the month
+        """
+        self.day1_column_index = day1_column_index
+        self.session_length = session_length
+        self.days_in_month = days_in_month
+
+        # day:(row, col) of each day's session
+        first_offset = (day1_column_index - self.FIRST_SESSION_COLUMN)//2
+        self.anchors = {}
+        for day in range(1, days_in_month+1):
+            week, weekday = divmod(first_offset + day - 1, 7)
+            self.anchors[day] = (
+                MonthGrid.FIRST_HEADER_ROW + week*session_length,
+                self.FIRST_SESSION_COLUMN + 2*weekday
+            )
+
+    def __repr__(self):
+        return(f"MonthLayout(day1_column_index={self.day1_column_index}, session_length={self.session_length}, days_in_month={self.days_in_month})")
+
+    def to_dict(self) -> dict:
+        return({
+            "day1_column_index": self.day1_column_index,
+            "session_length": self.session_length,
+            "days_in_month": self.days_in_month
+        })
+
+    def matches(self, grid:MonthGrid) -> bool:
+        """Whether every day's date header is where the layout expects it"""
+        n_rows, n_cols = grid.shape
+        for day, (row, col) in self.anchors.items():
+            if row >= n_rows or col >= n_cols:
+                return(False)
+            day_match = re.match(r"\s*(\d{1,2})", str(grid.values[row, col]))
+            if day_match is None or int(day_match.group(1)) != day:
+                return(False)
+        return(True)
+
+class LayoutCache:
+    CACHE_PATH = os.path.join('cache', 'layouts.json')
+    # Keys of the session lengths stored per TEMPLATE, rather than a layout
+    TEMPLATE_PREFIX = "template|"
+
+    def __init__(self, cache_path:str=None):
+        """
+        Month layouts keyed by (template signature, first weekday, days in
+        month). Months duplicated from the same TEMPLATE share their geometry
+        once the weekday of the 1st is known, so a cached layout is checked
+        against the grid's date headers rather than inferred from it again.
+        Also holds the session length of months made from each TEMPLATE,
+        keyed by a checksum of the TEMPLATE's values. Shared by every
+        spreadsheet and kept on disk between runs
+
+        Args:
+            cache_path (str, optional): Layouts JSON file. Defaults to CACHE_PATH.
+        """
+        self.cache_path = cache_path or self.CACHE_PATH
+        # key:layout dict, loaded on first use
+        self.layouts = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Sent to worker processes with the months they parse
+        return({k: v for k, v in self.__dict__.items() if k != "_lock"})
+
+    def __setstate__(self, state:dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def view(self):
+        """
+        Copy of the cached layouts with its own hit/miss counts, for a month
+        parsed on another thread or process. Merge it back with merge()
+        """
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            cache_view = LayoutCache(self.cache_path)
+            cache_view.layouts = dict(self.layouts)
+        return(cache_view)
+
+    def merge(self, cache_view):
+        """Add the layouts and hit/miss counts of a view()"""
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            self.layouts.update(cache_view.layouts or {})
+            self.hits += cache_view.hits
+            self.misses += cache_view.misses
+
+    def load(self):
+        self.layouts = {}
+        if not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as cache_file:
+                self.layouts = json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            print(f"\tIgnoring unreadable layout cache: {self.cache_path}")
+
+    def save(self):
+        with self._lock:
+            if self.layouts is None:
+                return
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            # Write to a temporary file first so an interrupted run can't corrupt the cache
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as cache_file:
+                json.dump(self.layouts, cache_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def template_signature(grid:MonthGrid) -> str:
+        """Grid size and the weekday header row, which only change with the TEMPLATE"""
+        n_rows, n_cols = grid.shape
+        weekday_row = grid.values[MonthGrid.FIRST_HEADER_ROW-1].tolist() if n_rows >= MonthGrid.FIRST_HEADER_ROW else []
+        return(hashlib.sha1(json.dumps([n_rows, n_cols, weekday_row]).encode()).hexdigest()[:16])
+
+    @classmethod
+    def key(cls, grid:MonthGrid, sheet_name:str) -> str:
+        month_dt = datetime.strptime(sheet_name, "%b %y")
+        first_weekday, days_in_month = calendar.monthrange(month_dt.year, month_dt.month)
+        return(f"{cls.template_signature(grid)}|{first_weekday}|{days_in_month}")
+
+    def get(self, grid:MonthGrid, sheet_name:str) -> MonthLayout:
+        """
+        Cached layout for the month if the grid's date headers match it,
+        otherwise None and the layout should be inferred from the grid
+        """
+        key = self.key(grid, sheet_name)
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            cached = self.layouts.get(key)
+
+        layout = MonthLayout(**cached) if cached is not None else None
+        is_hit = layout is not None and layout.matches(grid)
+        with self._lock:
+            if is_hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return(layout if is_hit else None)
+
+    def get_session_length(self, template_checksum:str) -> int:
+        """
+        Session length of months duplicated from the TEMPLATE with these
+        values, None if no such month has been read yet
+        """
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            cached = self.layouts.get(f"{self.TEMPLATE_PREFIX}{template_checksum}")
+        return(cached["session_length"] if cached is not None else None)
+
+    def put_session_length(self, template_checksum:str, session_length:int):
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            self.layouts[f"{self.TEMPLATE_PREFIX}{template_checksum}"] = {"session_length": session_length}
+
+    def put(self, grid:MonthGrid, sheet_name:str, layout:MonthLayout):
+        key = self.key(grid, sheet_name)
+        with self._lock:
+            if self.layouts is None:
+                self.load()
+            self.layouts[key] = layout.to_dict()
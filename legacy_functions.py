@@ -31,15 +31,8 @@ def get_clear_conditional_formatting_req(
         start_col (int): _description_
         end_col (int): _description_
     """
-    # Get all conditional formatting rules
-    response = self.service.spreadsheets().get(
-        spreadsheetId=self.spreadsheet_id,
-        fields="sheets.properties,sheets.conditionalFormats"
-    ).execute()
-
-    conditional_formats = self.get_sheet_conditional_formats(
-        response["sheets"], sheet_id
-    )
+    # Get all conditional formatting rules from the metadata snapshot
+    conditional_formats = self.metadata.conditional_formats(sheet_id)
 
     # Prepare requests to modify rules only for the specified range
     modify_requests = []
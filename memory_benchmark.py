@@ -0,0 +1,134 @@
+from datetime import datetime
+import tracemalloc
+import argparse
+import calendar
+import random
+import json
+import gc
+import os
+import sys
+
+from transport import OfflineTransport
+from api_context import ApiContext
+from session import Session
+from month_parser import MonthParser
+from month import Month
+
+HISTORY_PATH = os.path.join("reports", "memory_usage.json")
+EXERCISES = (
+    "Squat", "Bench Press", "Deadlift", "Overhead Press", "Barbell Row",
+    "Pull Up", "Dips", "Lunges", "Bicep Curl", "Tricep Extension", "REST"
+)
+RESULTS = ("", "5x5 100kg", "3x8 60kg", "3x10 20kg", "1x5 140kg @8", "8, 8, 7", "Felt heavy")
+
+def dict_session_class() -> type:
+    """Session as it was before __slots__, every instance with its own __dict__"""
+    namespace = {k: v for k, v in vars(Session).items() if k not in (*Session.__slots__, "__slots__")}
+    return(type("DictSession", (), namespace))
+
+def synthetic_month(month_dt:datetime, session_length:int, rng:random.Random) -> list:
+    """Month grid laid out like the TEMPLATE with every day filled in"""
+    rows = [["" for _ in range(15)] for _ in range(9 + 6*session_length)]
+    rows[1][1] = month_dt.strftime("%B %Y")
+    offset = (month_dt.weekday() + 1) % 7
+    for day in range(1, calendar.monthrange(month_dt.year, month_dt.month)[1] + 1):
+        week, weekday = divmod(offset + day - 1, 7)
+        row, col = 3 + week*session_length, 1 + 2*weekday
+        rows[row][col] = f"{day} - {rng.choice(['BACK', 'LEGS', 'CHEST, TRICEPS'])}"
+        for session_row in range(row + 1, row + rng.randint(2, session_length)):
+            rows[session_row][col] = rng.choice(EXERCISES[:-1])
+            rows[session_row][col + 1] = rng.choice(RESULTS)
+    return(rows)
+
+def load_months(grid_cache_path:str, n_months:int, session_length:int) -> dict:
+    """sheet_name:values from a grid cache file, or synthetic months"""
+    if grid_cache_path is not None:
+        with open(grid_cache_path) as cache_file:
+            sheets = json.load(cache_file)["sheets"]
+        return({name: sheet["values"] for name, sheet in sheets.items() if name[-3:-2] == " "})
+
+    rng = random.Random(0)
+    months = {}
+    month_dt = datetime(2020, 1, 1)
+    for _ in range(n_months):
+        months[month_dt.strftime("%b %y")] = synthetic_month(month_dt, session_length, rng)
+        month_dt = month_dt.replace(year=month_dt.year + month_dt.month//12, month=month_dt.month % 12 + 1)
+    return(months)
+
+def measure(months:dict, session_class:type, keep_grid:bool) -> dict:
+    """Memory still held once every month is parsed, in bytes"""
+    MonthParser.session_class = session_class
+    gc.collect()
+    tracemalloc.start()
+    month_instances = [
+        Month(
+            data=values,
+            spreadsheet_id="memory-benchmark",
+            sheet_name=sheet_name,
+            merged_ranges=[],
+            sheet_id=sheet_id,
+            keep_grid=keep_grid
+        ) for sheet_id, (sheet_name, values) in enumerate(months.items())
+    ]
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n_sessions = sum([len(m.month_sessions) for m in month_instances])
+    return({
+        "held_bytes": held,
+        "peak_bytes": peak,
+        "sessions": n_sessions,
+        "bytes_per_session": round(held/max(n_sessions, 1))
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory held by parsed months, dict vs slotted Session and with vs without the raw grid"
+    )
+    parser.add_argument('--grid-cache', default=None, help="Parse the months in a grid cache file rather than synthetic ones")
+    parser.add_argument('--months', type=int, default=60, help="Synthetic months to parse")
+    parser.add_argument('--session-length', type=int, default=9, help="Rows per synthetic session")
+    parser.add_argument('--history', default=HISTORY_PATH, help="Results history JSON file")
+    args = parser.parse_args()
+
+    # Parse offline, Month never needs the API when given its sheet ID
+    ApiContext.use_transport(OfflineTransport(lambda *args: (404, {}, b"{}")))
+    months = load_months(args.grid_cache, args.months, args.session_length)
+    # Build the API context before measuring, it's shared by every case
+    measure(dict(list(months.items())[:1]), Session, False)
+
+    cases = {
+        "dict_session_with_grid": (dict_session_class(), True),
+        "dict_session": (dict_session_class(), False),
+        "slotted_session_with_grid": (Session, True),
+        "slotted_session": (Session, False)
+    }
+    results = {}
+    for case, (session_class, keep_grid) in cases.items():
+        results[case] = measure(months, session_class, keep_grid)
+    MonthParser.session_class = Session
+
+    baseline = results["dict_session_with_grid"]["held_bytes"]
+    print(f"{len(months)} months, {results['slotted_session']['sessions']} sessions")
+    for case, result in results.items():
+        print(
+            f"{case:<26} held {result['held_bytes']/1e6:7.2f}MB  "
+            f"peak {result['peak_bytes']/1e6:7.2f}MB  "
+            f"{result['bytes_per_session']:>6} B/session  "
+            f"({result['held_bytes']/baseline:.0%} of dict_session_with_grid)"
+        )
+
+    history = []
+    if os.path.isfile(args.history):
+        with open(args.history) as history_file:
+            history = json.load(history_file)
+    history.append({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "months": len(months),
+        "results": results
+    })
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "w") as history_file:
+        json.dump(history, history_file, indent=2)
@@ -0,0 +1,42 @@
+class MergeIndex:
+    def __init__(self, merge_ranges:list=None):
+        """
+        Cell occupancy grid for a sheet's merged ranges. Every cell covered by
+        a merge maps to its merge range, so checking whether a rectangle
+        overlaps a merge costs the rectangle's area rather than a scan over
+        every merge on the sheet
+
+        Args:
+            merge_ranges (list, optional): Merge ranges as returned by the
+                Sheets API (startRowIndex, endRowIndex, ... half open). Defaults to None.
+        """
+        # (row, col):merge_range
+        self.cells = {}
+        self.merge_ranges = []
+        for merge_range in merge_ranges or []:
+            self.add(merge_range)
+
+    def __len__(self):
+        return(len(self.merge_ranges))
+
+    def add(self, merge_range:dict):
+        """Add a merge range, e.g. once merge_cells has been requested."""
+        self.merge_ranges.append(merge_range)
+        for row in range(merge_range['startRowIndex'], merge_range['endRowIndex']):
+            for col in range(merge_range['startColumnIndex'], merge_range['endColumnIndex']):
+                self.cells[(row, col)] = merge_range
+
+    def find(self, row:int, col:int):
+        """Merge range covering the cell, None if the cell isn't merged."""
+        return(self.cells.get((row, col)))
+
+    def overlaps(self, start_row:int, end_row:int, start_col:int, end_col:int) -> bool:
+        """
+        Whether any merge covers a cell in the half open rectangle
+        [start_row, end_row) x [start_col, end_col)
+        """
+        for row in range(start_row, end_row):
+            for col in range(start_col, end_col):
+                if (row, col) in self.cells:
+                    return(True)
+        return(False)
@@ -1,8 +1,11 @@
 from program_base import ProgramBase
+from merge_index import MergeIndex
 
+from month_parser import MonthParser, parse_month
+from layout_cache import LayoutCache
+from session_snapshot import SessionSnapshot
 from session  import Session
 from datetime import datetime
-import re
 
 class Month(ProgramBase):
     def __init__(
@@ -11,7 +14,12 @@ class Month(ProgramBase):
             spreadsheet_id:str,
             sheet_name:str,
             merged_ranges:dict,
-            pre_processed=True
+            pre_processed=True,
+            sheet_id:int=None,
+            session_snapshot:SessionSnapshot=None,
+            layout_cache:LayoutCache=None,
+            keep_grid:bool=False,
+            parsed:MonthParser=None
         ):
         """
         Obect to store every element of a given month of training
@@ -19,37 +27,41 @@ class Month(ProgramBase):
         Args:
             month_values (list): List of lists for all values on a given sheet
                 (this method prevents having to pass a gspread instance between classes)
+            sheet_id (int, optional): Tab-specific sheet ID if already known,
+                otherwise looked up. Defaults to None.
+            session_snapshot (SessionSnapshot, optional): Sessions from the
+                last run, reused where their cells are unchanged. Defaults to None.
+            layout_cache (LayoutCache, optional): Layouts of months from the
+                same template, checked before inferring the layout. Defaults to None.
+            keep_grid (bool, optional): Keep the raw values and grid after the
+                sessions are built. Defaults to False.
+            parsed (MonthParser, optional): The month already parsed, e.g. in a
+                worker process, otherwise data is parsed here. Defaults to None.
         """
         # Initialise ProgramBase variables and credentials (actually pulls already initialised class)
         super().__init__(spreadsheet_id, refresh_sheet=False)
 
-        self.month_values = data
         self.sheet_name = sheet_name
 
         # Find the tab-specific sheet ID using ProgramBase.find_sheet_id
-        self.sheet_id = self.find_sheet_id(sheet_name, pre_processed, spreadsheet_id)
+        if sheet_id is None:
+            sheet_id = self.find_sheet_id(sheet_name, pre_processed, spreadsheet_id)
+        self.sheet_id = sheet_id
         
-        # Assign merged ranges
+        # Assign merged ranges, indexed by cell for overlap checks
         self.merged_ranges = merged_ranges
-
-        # Find where day 1 starts in this given month
-        self.day1_column_index = self.find_dayx(day_num=1, row_num=4)
-        # Get month header in the sheet
-        self.month = self.get_month()
-
-        # Find the session length for day 1, assume same session length throughout month
-        self.session_length = Month.find_session_length(
-            self.day1_column_index, 
-            self.month_values
-        )
-
-        # Expect formatted month values
-        if pre_processed:
-            self.month_sessions = self.build_sessions(
-                self.day1_column_index
-            )
-        else:
-            self.month_sessions = None
+        self.merge_index = MergeIndex(merged_ranges)
+
+        # Grid to sessions parsing doesn't need the API
+        if parsed is None:
+            parsed = parse_month(data, sheet_name, session_snapshot, layout_cache, pre_processed, keep_grid)
+        self.month_values = parsed.month_values
+        self.grid = parsed.grid
+        self.layout = parsed.layout
+        self.day1_column_index = parsed.day1_column_index
+        self.session_length = parsed.session_length
+        self.month = parsed.month
+        self.month_sessions = parsed.month_sessions
 
         #! self.get_month_meta_data()
 
@@ -57,237 +69,6 @@ class Month(ProgramBase):
     def __repr__(self):
         return(f"#MI{self.sheet_name.replace(' ', '')}")
 
-    def find_dayx(self, day_num:int=1, row_num:int=4):
-        """
-        Iterate through columns to find day 'day_num' and locate the
-        session boundaries of the sheet for that day
-
-        Raises:
-            Exception: If day x not identified
-        """
-        # Searching 
-        skip_col_a = True
-        day_x_column_index = None
-        # row_num 0 index
-        for col_ind, col_val in enumerate(self.month_values[row_num-1]):
-            # Skip column A to avoid week numbers
-            if skip_col_a:
-                skip_col_a = False
-                continue
-
-            # When the first day of the month is found "1" or "1 - ___"
-            if re.search(f"{day_num}( - )?", col_val) is not None:
-                day_x_column_index = col_ind
-        
-        if day_x_column_index is None:
-            # Convert to custom exception class in future
-            raise Exception(f"Column for day, {day_num}, not identified in row, {row_num}")
-        
-        return(day_x_column_index)
-    
-    def get_month(self):
-        """
-        Get sheet header containing the month
-        """
-        month_cell_value = self.month_values[1][1]
-        try:
-            month = re.findall("(\w* \d{4})", month_cell_value)[0]
-        except IndexError:
-            raise Exception(f"No month title found, has this sheet been copied manually or edited? {month_cell_value}")
-        month_formatted = datetime.strptime(month, '%B %Y').strftime("%Y-%m")
-        return(month_formatted)
-
-    def find_session_length(day_1_column_index:int, month_vals:list):
-        """
-        Function to find the number of rows in a session for the month.
-
-        Iterate through rows through the column that has day 1 to look for day 8
-        to ultimately calculate the number of columns per session. This is important
-        if session structure changes month-to-month
-
-        Args:
-            day_1_column_index (int)
-
-        Raises:
-            Exception: If date headers are invalid for matching
-        """
-                
-        session_length = 0
-        for row_ind, row_vals in enumerate(month_vals):
-            if row_ind < 3:
-                continue
-
-            if re.search("8( - )?", row_vals[day_1_column_index]) is None:
-                session_length += 1
-            else:
-                return(session_length)
-        # Convert to custom exception class in future
-        raise Exception("Date headers invalid for matching")
-    
-
-    def row_iterate(self, row_number:int, column_index_init:int=0):
-        """        
-        Iterate through the row in the program creating Session objects at every other
-        column to account for both the exercise name and the corresponding comment to the
-        right
-
-        Args:
-            row_number (int)
-            column_index_init (int, optional): Initialising column index. Defaults to 1.
-        """
-        
-        # Get the first session
-        col_val = column_index_init
-        starting_coords = (row_number,col_val)
-
-        # s_data keys:
-        #   "Session Title",
-        #   "meta",
-        # }
-        s_data = self.get_session_values(session_anchor=starting_coords)
-        session = Session(
-            session_data=s_data,
-            session_length=self.session_length,
-            month=self.month
-        )
-
-        # If no session at first position the row is empty. 
-        # # (Not is_valid as a REST would not be valid)
-        if session.status["is_none"]:
-            return(None)
-        else:
-            row_sessions = [session]
-
-        column_increment = 1
-        # While there are still days in the week or we reach Saturday
-        while col_val < 13:
-            col_val = column_index_init+(column_increment*2)
-            # Top left column of the session
-            session_anchor = (row_number, col_val)
-            s_data = self.get_session_values(session_anchor=session_anchor)
-
-            # If we reach an invalid session
-            if s_data is None:
-                # Assume we're at the end of valid sessions for the week
-                break
-            
-            session = Session(
-                session_data=s_data,
-                session_length=self.session_length,
-                month=self.month
-            )
-            column_increment+=1
-            if not session.status["is_none"]:
-                row_sessions.append(session)
-
-        return(row_sessions)
-    
-    def build_sessions(self, day_1_column_index:int):
-        """
-        Starting from Day 1, slice the list of lists so each Session can be stored
-        as it's own object
-
-        Args:
-            day_1_column_index (int): Index containing day 1 for the first row
-        """
-
-        all_sessions = []
-        # Every row that contains a date
-        for row_index in range(3,(9+(5*self.session_length)), self.session_length):
-            # First row starts depending on where Sunday falls
-            if row_index == 3:
-                column_start_index = day_1_column_index
-            # All other rows start at index 1
-            else:
-                column_start_index = 1
-            
-            # week_sessions holds a session object for every day of that week
-            week_sessions = self.row_iterate(
-                row_number=row_index,
-                column_index_init=column_start_index
-            )
-            if week_sessions is not None:
-                # Concatenate all month sessions
-                all_sessions = [*all_sessions, *week_sessions]
-        
-        return(all_sessions)
-
-    def get_session_values(self, session_anchor:tuple) -> dict:
-        """
-        Get slice of the given month for a requested session anchor (top
-        left cell of a session)
-
-        Args:
-            session_anchor (tuple): top left (row,col) index of the session
-
-        Returns:
-            dict: exercise:details key values
-        """
-
-        session_title = self.month_values[session_anchor[0]][session_anchor[1]]
-        
-        # If no session title, not a valid session
-        if re.sub(r"\s+", "", session_title) == "":
-            return(None)
-
-        try:
-            session_day = re.findall("\d{1,2}", session_title)[0]
-        except IndexError:
-            print(f"Session day not found from:.{session_title}.")
-            raise IndexError
-        
-        session_vals = {
-            "Session Title": session_title,
-            "meta": {
-                "date": datetime.strptime(f"{session_day} {self.sheet_name}", "%d %b %y"),
-                "empty_exercise_range": dict(),
-                "session_anchor": session_anchor
-            }
-        }
-
-        ## -- Handle Finding Empty Session Cells -- ##
-
-        empty_sessions = False
-        # For each row in the session
-        for row in range(session_anchor[0]+1, session_anchor[0]+self.session_length):
-            # Extract the exercise from the row
-            exercise = self.month_values[row][session_anchor[1]]
-            # Extract the outcome from the row
-            outcome = self.month_values[row][session_anchor[1]+1]
-
-            if exercise == "":
-                # One empty exercise encountered already
-                if "" in session_vals.keys():
-                    # Count the empty exercises
-                    #! Convert these keys to "empty"
-                    session_vals[""] += 1
-                else:
-                    # Record first empty exercise
-                    #! Convert these keys to "empty"
-                    session_vals[""] = 1
-                    # Record that this session has at least one empty sessio
-                    empty_sessions = True
-                    # As this is the first empty exercise set the top left
-                    # cell to be the 'cell achor' for the empty cells to merge
-                    session_vals["meta"]["empty_exercise_range"].update(
-                        {"start": (row, session_anchor[1])}
-                    )
-            else:
-                # Otherwise just append the exercise,outcome key-values to session vals
-                session_vals[exercise] = outcome
-        
-        # If at least one empty sessio
-        if empty_sessions:
-            # Set the bottom right cell of empty cells to merge
-            session_vals["meta"]["empty_exercise_range"].update(
-                {"end": (
-                    session_anchor[0]+self.session_length-1, 
-                    session_anchor[1]+1
-                )}
-            )
-
-        return(session_vals)
-    
     def get_month_meta_data(self, verbose):
         self.total_sessions = sum([1 for s in self.month_sessions if s.status["is_valid"]])
         if self.total_sessions != 0:
@@ -330,6 +111,10 @@ class Month(ProgramBase):
             return True
         return False
 
+    def find_merge_range(self, row, col):
+        """Merge range containing the cell, None if the cell isn't merged."""
+        return(self.merge_index.find(row, col))
+
     #! Move to session.py to give an status["is_merged"] value
     def get_merge_status(self, session: Session):
         """Determine if the session has been processed based on merged cells."""
@@ -338,14 +123,15 @@ class Month(ProgramBase):
         session_end_row = session_start_row + self.session_length
         session_end_col = session_start_col + 2  # Assuming a single-column session width
 
-        for merge_range in self.merged_ranges:
-            # Check if the session range overlaps with the merge range
-            if (merge_range['startRowIndex'] <= session_end_row and
-                merge_range['endRowIndex'] > session_start_row and
-                merge_range['startColumnIndex'] <= session_end_col and
-                merge_range['endColumnIndex'] > session_start_col):
-
-                return True
+        # Check if the session range overlaps with any merge range (session end
+        # row and column are inclusive)
+        if self.merge_index.overlaps(
+            session_start_row,
+            session_end_row+1,
+            session_start_col,
+            session_end_col+1
+        ):
+            return True
 
         print("No overlap found with merged ranges")
         return False
@@ -409,6 +195,16 @@ class Month(ProgramBase):
                     sheet_name=self.sheet_name
                     # colour_borders=True
                 )
+                # Keep the index up to date for the sessions that follow
+                self.merge_index.add(
+                    self.get_merge_request(
+                        self.sheet_id,
+                        session.empty_exercise_range["start"][0],
+                        session.empty_exercise_range["end"][0],
+                        session.empty_exercise_range["start"][1],
+                        session.empty_exercise_range["end"][1]
+                    )['mergeCells']['range']
+                )
 
             ## -- Handle Session Title -- ##
 
@@ -0,0 +1,164 @@
+import numpy as np
+import hashlib
+
+class MonthGrid:
+    # Cell tokens
+    BLANK = 0
+    DATE_HEADER = 1
+    EXERCISE = 2
+    RESULT = 3
+
+    # Row of the first week's date headers (0 indexed)
+    FIRST_HEADER_ROW = 3
+    # Sessions in a week start no further right than this column
+    LAST_SESSION_COLUMN = 13
+
+    def __init__(self, values:list):
+        """
+        A month sheet's values as a NumPy string array, so the layout
+        (day columns, session length, session anchors and empty exercises)
+        is found with a few whole-grid array operations rather than a regex
+        per cell. Ragged rows are padded with "" like gspread's fill_gaps
+
+        Args:
+            values (list): List of lists of cell values for the sheet
+        """
+        width = max([len(row) for row in values] + [0])
+        if all([len(row) == width for row in values]):
+            grid = np.array(values, dtype=str)
+        else:
+            grid = np.array([[*row, *[""]*(width - len(row))] for row in values], dtype=str)
+        self.values = grid.reshape(len(values), width)
+
+        # Exactly empty cells, and cells with nothing but whitespace
+        self.empty = self.values == ""
+        self.blank = np.strings.strip(self.values) == ""
+        # text:cells containing text
+        self._contains = {}
+        self.tokens = None
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return(self.values.shape)
+
+    def contains(self, text:str) -> np.ndarray:
+        """Boolean mask of the cells containing text, cached per text"""
+        if text not in self._contains:
+            self._contains[text] = np.strings.find(self.values, text) >= 0
+        return(self._contains[text])
+
+    def find_dayx(self, day_num:int, row_num:int) -> int:
+        """
+        Right-most column (after column A's week numbers) whose cell on row
+        row_num (1 indexed) contains the day number, None if there isn't one
+        """
+        columns = np.flatnonzero(self.contains(str(day_num))[row_num-1, 1:])
+        if columns.size == 0:
+            return(None)
+        return(int(columns[-1]) + 1)
+
+    def find_session_length(self, day_1_column_index:int) -> int:
+        """
+        Rows from the first date header down to the one containing day 8
+        in day 1's column, None if day 8 isn't found
+        """
+        rows = np.flatnonzero(self.contains("8")[self.FIRST_HEADER_ROW:, day_1_column_index])
+        if rows.size == 0:
+            return(None)
+        return(int(rows[0]))
+
+    def classify(self, session_length:int) -> np.ndarray:
+        """
+        Token for every cell: DATE_HEADER on the header rows (unless only
+        whitespace), EXERCISE and RESULT in the odd and even columns of the
+        session rows, BLANK for empty cells and column A's week numbers
+        """
+        n_rows, n_cols = self.shape
+        rows = np.arange(n_rows)[:, None]
+        cols = np.arange(n_cols)[None, :]
+        header_rows = (rows >= self.FIRST_HEADER_ROW) & ((rows - self.FIRST_HEADER_ROW) % session_length == 0)
+        session_rows = rows >= self.FIRST_HEADER_ROW
+
+        tokens = np.full(self.shape, self.BLANK, dtype=np.int8)
+        tokens[session_rows & (cols % 2 == 1) & ~self.empty] = self.EXERCISE
+        tokens[session_rows & (cols % 2 == 0) & (cols > 0) & ~self.empty] = self.RESULT
+        tokens[np.broadcast_to(header_rows, self.shape)] = self.BLANK
+        tokens[header_rows & ~self.blank] = self.DATE_HEADER
+        self.tokens = tokens
+        return(tokens)
+
+    def row_anchors(self, row_number:int, column_index_init:int) -> list[tuple]:
+        """
+        Session anchors along a header row. Sessions run every other column
+        from column_index_init until the first one past LAST_SESSION_COLUMN
+        and stop at the first session without a title
+
+        Returns:
+            list[tuple]: (row, col) of each session in the row
+        """
+        columns = [column_index_init]
+        while columns[-1] < self.LAST_SESSION_COLUMN:
+            columns.append(columns[-1] + 2)
+
+        has_title = (self.tokens[row_number, columns] == self.DATE_HEADER).tolist()
+        n_sessions = has_title.index(False) if False in has_title else len(columns)
+        return([(row_number, col) for col in columns[:n_sessions]])
+
+    def session_blocks(self, session_anchors:list, session_length:int) -> list[tuple]:
+        """
+        Title, exercises, results and empty exercise slots of every session
+        in one pass over the grid
+
+        Args:
+            session_anchors (list): (row, col) of each session's date header
+            session_length (int): Rows per session, including the header
+
+        Returns:
+            list[tuple]: (title, exercises, results, first empty row offset,
+                empty count) per session. The title is None if the session
+                has no date header, the offset is None if no exercise is empty
+        """
+        if len(session_anchors) == 0:
+            return([])
+        anchors = np.array(session_anchors, dtype=int).reshape(-1, 2)
+        anchor_rows, anchor_cols = anchors[:, :1], anchors[:, 1:]
+        if (anchor_rows + session_length > self.shape[0]).any() or (anchor_cols + 1 >= self.shape[1]).any():
+            raise IndexError(f"Session runs off the sheet, {self.shape} grid")
+
+        titled = self.tokens[anchors[:, 0], anchors[:, 1]] == self.DATE_HEADER
+        body_rows = anchor_rows + np.arange(1, session_length)
+        empty = self.tokens[body_rows, anchor_cols] != self.EXERCISE
+        n_empty = empty.sum(axis=1)
+        first_empty = np.where(n_empty > 0, empty.argmax(axis=1), -1)
+
+        blocks = zip(
+            self.values[anchors[:, 0], anchors[:, 1]].tolist(),
+            titled.tolist(),
+            self.values[body_rows, anchor_cols].tolist(),
+            self.values[body_rows, anchor_cols + 1].tolist(),
+            first_empty.tolist(),
+            n_empty.tolist()
+        )
+        return([
+            (title if is_titled else None, exercises, results, first if first >= 0 else None, count)
+            for title, is_titled, exercises, results, first, count in blocks
+        ])
+
+    def block_hashes(self, session_anchors:list, session_length:int, salt:str="") -> list[str]:
+        """
+        Hash of each session's block of cells, the anchor down session_length
+        rows by the exercise and result columns. salt covers anything else a
+        Session depends on (sheet name, month header, session length)
+        """
+        if len(session_anchors) == 0:
+            return([])
+        anchors = np.array(session_anchors, dtype=int).reshape(-1, 2)
+        block_rows = anchors[:, :1] + np.arange(session_length)
+        if (block_rows[:, -1] >= self.shape[0]).any() or (anchors[:, 1] + 1 >= self.shape[1]).any():
+            raise IndexError(f"Session runs off the sheet, {self.shape} grid")
+
+        blocks = self.values[block_rows[:, :, None], anchors[:, None, 1:] + np.arange(2)]
+        return([
+            hashlib.sha1("\x1f".join([salt, *block]).encode()).hexdigest()
+            for block in blocks.reshape(len(anchors), -1).tolist()
+        ])
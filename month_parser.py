@@ -0,0 +1,337 @@
+from datetime import datetime
+import calendar
+import sys
+import re
+
+from month_grid import MonthGrid
+from layout_cache import LayoutCache, MonthLayout
+from session_snapshot import SessionSnapshot
+from session import Session
+
+class MonthParser:
+    # Session type built for each day, swappable for memory benchmarks
+    session_class = Session
+
+    def __init__(
+            self,
+            data:list,
+            sheet_name:str,
+            session_snapshot:SessionSnapshot=None,
+            layout_cache:LayoutCache=None
+        ):
+        """
+        Grid to sessions parsing for a month sheet, without any API access.
+        Everything it holds pickles, so months can be parsed in worker
+        processes and the parser sent back
+
+        Args:
+            data (list): List of lists for all values on the month's sheet
+            sheet_name (str): Month sheet name, e.g. "Jan 24"
+            session_snapshot (SessionSnapshot, optional): Sessions from the
+                last run, reused where their cells are unchanged. Defaults to None.
+            layout_cache (LayoutCache, optional): Layouts of months from the
+                same template, checked before inferring the layout. Defaults to None.
+        """
+        self.month_values = data
+        # Grid of the month values for whole-sheet layout lookups
+        self.grid = MonthGrid(data)
+        self.sheet_name = sheet_name
+        self.session_snapshot = session_snapshot
+        self.layout_cache = layout_cache
+
+        self.layout = None
+        self.day1_column_index = None
+        self.session_length = None
+        self.month = None
+        self.month_sessions = None
+
+    def __repr__(self):
+        return(f"#MP{self.sheet_name.replace(' ', '')}")
+
+    def parse(self, pre_processed:bool=True, keep_grid:bool=False):
+        """
+        Find the month's layout and header, then build its sessions
+
+        Args:
+            pre_processed (bool, optional): Build sessions, new months from
+                the template only need the layout. Defaults to True.
+            keep_grid (bool, optional): Keep the raw values and grid after the
+                sessions are built. Defaults to False.
+
+        Returns:
+            MonthParser: self
+        """
+        # Find where day 1 starts and the session length for day 1, assume
+        # same session length throughout month
+        self.layout = self.find_layout()
+        self.day1_column_index = self.layout.day1_column_index
+        self.session_length = self.layout.session_length
+        # Get month header in the sheet
+        self.month = self.get_month()
+
+        # Classify every cell as a date header, exercise, result or blank
+        self.grid.classify(self.session_length)
+
+        # Expect formatted month values
+        if pre_processed:
+            self.month_sessions = self.build_sessions(
+                self.day1_column_index
+            )
+
+        # Sessions and layout hold everything needed from here on
+        if not keep_grid:
+            self.release_grid()
+        return(self)
+
+    def release_grid(self):
+        """
+        Drop the raw month values and grid. Lookups on the grid (find_dayx,
+        get_session_values, build_sessions) aren't available afterwards
+        """
+        self.month_values = None
+        self.grid = None
+
+    def find_layout(self) -> MonthLayout:
+        """
+        Month layout from the layout cache if the grid matches a cached one,
+        otherwise inferred from the grid (and cached if its date headers
+        are all where expected)
+        """
+        layout_cache = self.layout_cache
+        if layout_cache is not None:
+            layout = layout_cache.get(self.grid, self.sheet_name)
+            if layout is not None:
+                return(layout)
+
+        day1_column_index = self.find_dayx(day_num=1, row_num=4)
+        month_dt = datetime.strptime(self.sheet_name, "%b %y")
+        layout = MonthLayout(
+            day1_column_index=day1_column_index,
+            session_length=MonthParser.find_session_length(day1_column_index, self.grid),
+            days_in_month=calendar.monthrange(month_dt.year, month_dt.month)[1]
+        )
+        if layout_cache is not None and layout.matches(self.grid):
+            layout_cache.put(self.grid, self.sheet_name, layout)
+        return(layout)
+
+    def find_dayx(self, day_num:int=1, row_num:int=4):
+        """
+        Find the column of day 'day_num' on row 'row_num' (1 indexed) to
+        locate the session boundaries of the sheet for that day. Matches
+        "1" or "1 - ___", the right-most match wins and column A's week
+        numbers are skipped
+
+        Raises:
+            Exception: If day x not identified
+        """
+        day_x_column_index = self.grid.find_dayx(day_num, row_num)
+        
+        if day_x_column_index is None:
+            # Convert to custom exception class in future
+            raise Exception(f"Column for day, {day_num}, not identified in row, {row_num}")
+        
+        return(day_x_column_index)
+    
+    def get_month(self):
+        """
+        Get sheet header containing the month
+        """
+        month_cell_value = str(self.grid.values[1, 1])
+        try:
+            month = re.findall("(\w* \d{4})", month_cell_value)[0]
+        except IndexError:
+            raise Exception(f"No month title found, has this sheet been copied manually or edited? {month_cell_value}")
+        month_formatted = datetime.strptime(month, '%B %Y').strftime("%Y-%m")
+        return(month_formatted)
+
+    @staticmethod
+    def find_session_length(day_1_column_index:int, month_vals):
+        """
+        Function to find the number of rows in a session for the month.
+
+        Look down the column that has day 1 for day 8 to ultimately calculate
+        the number of rows per session. This is important if session structure
+        changes month-to-month
+
+        Args:
+            day_1_column_index (int)
+            month_vals (list | MonthGrid): Month values
+
+        Raises:
+            Exception: If date headers are invalid for matching
+        """
+        if not isinstance(month_vals, MonthGrid):
+            month_vals = MonthGrid(month_vals)
+
+        session_length = month_vals.find_session_length(day_1_column_index)
+        if session_length is None:
+            # Convert to custom exception class in future
+            raise Exception("Date headers invalid for matching")
+        return(session_length)
+
+    def row_iterate(self, row_number:int, column_index_init:int=0):
+        """        
+        Create Session objects at every other column of the row to account for
+        both the exercise name and the corresponding comment to the right
+
+        Args:
+            row_number (int)
+            column_index_init (int, optional): Initialising column index. Defaults to 1.
+        """
+        # Top left cell of each titled session, up to the first untitled one
+        session_anchors = self.grid.row_anchors(row_number, column_index_init)
+
+        # If no session at first position the row is empty. 
+        if len(session_anchors) == 0:
+            return(None)
+        return(self.create_sessions(session_anchors))
+
+    def create_sessions(self, session_anchors:list) -> list[Session]:
+        """
+        Session objects for the anchors. Sessions whose cells are unchanged
+        since the session snapshot are reused, the rest are read from the
+        grid in one pass
+        """
+        if self.session_snapshot is None:
+            return(self.read_sessions(session_anchors))
+
+        block_hashes = self.grid.block_hashes(
+            session_anchors,
+            self.session_length,
+            salt=f"{self.sheet_name}|{self.month}|{self.session_length}"
+        )
+        sessions = [
+            self.session_snapshot.get(self.sheet_name, session_anchor, block_hash)
+            for session_anchor, block_hash in zip(session_anchors, block_hashes)
+        ]
+
+        # Rebuild only the sessions that changed
+        stale = [i for i, session in enumerate(sessions) if session is None]
+        rebuilt = self.read_sessions([session_anchors[i] for i in stale])
+        for i, session in zip(stale, rebuilt):
+            sessions[i] = session
+
+        self.session_snapshot.update(self.sheet_name, session_anchors, block_hashes, sessions)
+        self.session_snapshot.reused += len(sessions) - len(stale)
+        self.session_snapshot.rebuilt += len(stale)
+        return(sessions)
+
+    def read_sessions(self, session_anchors:list) -> list[Session]:
+        """Session objects for the anchors, read from the grid in one pass"""
+        blocks = self.grid.session_blocks(session_anchors, self.session_length)
+        # s_data keys:
+        #   "Session Title",
+        #   "meta",
+        # }
+        return([
+            self.session_class(
+                session_data=self.get_session_values(session_anchor=session_anchor, block=block),
+                session_length=self.session_length,
+                month=self.month
+            ) for session_anchor, block in zip(session_anchors, blocks)
+        ])
+    
+    def build_sessions(self, day_1_column_index:int):
+        """
+        Starting from Day 1, slice the month grid so each Session can be stored
+        as it's own object
+
+        Args:
+            day_1_column_index (int): Index containing day 1 for the first row
+        """
+
+        session_anchors = []
+        # Every row that contains a date
+        for row_index in range(3,(9+(5*self.session_length)), self.session_length):
+            # First row starts depending on where Sunday falls
+            if row_index == 3:
+                column_start_index = day_1_column_index
+            # All other rows start at index 1
+            else:
+                column_start_index = 1
+            
+            # A session anchor for every day of that week, rows without a
+            # first session are empty
+            session_anchors.extend(self.grid.row_anchors(
+                row_number=row_index,
+                column_index_init=column_start_index
+            ))
+        
+        # Read every session of the month from the grid at once
+        all_sessions = self.create_sessions(session_anchors)
+        if self.session_snapshot is not None:
+            # Forget sessions no longer in the month, e.g. a cleared title
+            self.session_snapshot.retain(self.sheet_name, session_anchors)
+        return(all_sessions)
+
+    def get_session_values(self, session_anchor:tuple, block:tuple=None) -> dict:
+        """
+        Get slice of the given month for a requested session anchor (top
+        left cell of a session)
+
+        Args:
+            session_anchor (tuple): top left (row,col) index of the session
+            block (tuple, optional): The session's MonthGrid.session_blocks
+                entry if already read. Defaults to None.
+
+        Returns:
+            dict: exercise:details key values
+        """
+        if block is None:
+            block = self.grid.session_blocks([session_anchor], self.session_length)[0]
+        session_title, exercises, outcomes, first_empty, empty_count = block
+        
+        # If no session title, not a valid session
+        if session_title is None:
+            return(None)
+
+        try:
+            session_day = re.findall("\d{1,2}", session_title)[0]
+        except IndexError:
+            print(f"Session day not found from:.{session_title}.")
+            raise IndexError
+        
+        session_vals = {
+            "Session Title": session_title,
+            "meta": {
+                "date": datetime.strptime(f"{session_day} {self.sheet_name}", "%d %b %y"),
+                "empty_exercise_range": dict(),
+                "session_anchor": session_anchor
+            }
+        }
+
+        ## -- Handle Finding Empty Session Cells -- ##
+
+        # Exercise,outcome key-values in row order, with the count of empty
+        # exercises at the first empty row
+        #! Convert these keys to "empty"
+        for row_offset, (exercise, outcome) in enumerate(zip(exercises, outcomes)):
+            if row_offset == first_empty:
+                session_vals[""] = empty_count
+            elif exercise != "":
+                # Exercise names repeat across every session, share one copy of each
+                session_vals[sys.intern(exercise)] = outcome
+        
+        # If at least one empty exercise, set the top left and bottom right
+        # cells of the empty cells to merge
+        if first_empty is not None:
+            session_vals["meta"]["empty_exercise_range"].update({
+                "start": (session_anchor[0]+1+first_empty, session_anchor[1]),
+                "end": (
+                    session_anchor[0]+self.session_length-1, 
+                    session_anchor[1]+1
+                )
+            })
+
+        return(session_vals)
+
+def parse_month(
+        data:list,
+        sheet_name:str,
+        session_snapshot:SessionSnapshot=None,
+        layout_cache:LayoutCache=None,
+        pre_processed:bool=True,
+        keep_grid:bool=False
+    ) -> MonthParser:
+    """Parse a month's values, module level so it can run in a worker process"""
+    return(MonthParser(data, sheet_name, session_snapshot, layout_cache).parse(pre_processed, keep_grid))
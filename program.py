@@ -1,4 +1,6 @@
-from comment import RawCommentFile
+from exercise_log import ExerciseLog
+from result_enricher import ResultEnricher
+from result_parser import ResultParser
 
 from dateutil.relativedelta import relativedelta
 from datetime import datetime
@@ -7,10 +9,14 @@ import pandas as pd
 import numpy as np
 import yaml
 import os
-import re
 
 class Program:
     PROGRAM_SPECS_PATH = "program_specs.yaml"
+    # Months after the current one that should already have a sheet
+    MONTHS_AHEAD = 1
+
+    # Shared across programs so repeated results are only parsed once per run
+    result_parser = ResultParser()
 
     def __init__(
             self, 
@@ -62,23 +68,26 @@ class Program:
 
         ### --- Get / Generate Archived Comments --- ###
 
-        # Returns None if no data provided
-        legacy_exercise_df = self.get_archived_comments(
-            parsed_comment_location,
-            legacy_comment_location,
-            reparse_legacy
-        )
+        with self.sheet.stage("parse"):
+            # Returns None if no data provided
+            legacy_exercise_df = self.get_archived_comments(
+                parsed_comment_location,
+                legacy_comment_location,
+                reparse_legacy
+            )
 
-        # ### --- Combine Legacy and New Format Month Data --- ###
+            # ### --- Combine Legacy and New Format Month Data --- ###
 
-        all_exercise_df = self.concatenate_all_months(
-            legacy_exercise_df,
-            self.sheet.month_instances
-        )
+            all_exercise_df = self.concatenate_all_months(
+                legacy_exercise_df,
+                self.sheet.month_instances,
+                verbose
+            )
 
         # ### --- Enrich Logged Results --- ###
 
-        enriched_logs_df = self.enrich_logs(all_exercise_df)
+        with self.sheet.stage("enrich"):
+            enriched_logs_df = self.enrich_logs(all_exercise_df)
 
         # Write newly parsed comments to the sheet
         self.sheet.write_to_sheet(
@@ -87,21 +96,17 @@ class Program:
         )
 
         ## --- Add Missing Months --- ###
-        
-        all_months = [m.sheet_name for m in self.sheet.month_instances.values()]
-
-        current_month_dt = datetime.now()
-        current_month_str = current_month_dt.strftime("%b %y")
-        next_month_dt = datetime.now() + relativedelta(months=1)
-        next_month_str = next_month_dt.strftime("%b %y")
 
-        # Always be one month ahead, add missing months
-        if current_month_str not in all_months:
-            # Add new month (if necessary) and clean the formatting with clean_new_month()
-            self.sheet.add_new_month(current_month_dt)
-        if next_month_str not in all_months:
-            # Add new month (if necessary) and clean the formatting with clean_new_month()
-            self.sheet.add_new_month(next_month_dt)
+        # Always be MONTHS_AHEAD months ahead, add missing months (and clean
+        # their formatting with clean_new_month()) in one batch
+        upcoming_months = [
+            datetime.now() + relativedelta(months=n) for n in range(self.MONTHS_AHEAD + 1)
+        ]
+        missing_months = [
+            m for m in upcoming_months if m.strftime("%b %y") not in self.sheet.sheet_ids
+        ]
+        if missing_months != []:
+            self.sheet.add_new_months(missing_months)
 
         ### --- Program Meta --- ###
 
@@ -137,6 +142,7 @@ class Program:
                     legacy_comments = ''.join(coms.readlines())
 
                 # Parse the raw comments getting rid of unnecessary information with re
+                from comment import RawCommentFile
                 raw_comments = RawCommentFile(legacy_comments)
                 raw_comments.save_to_local(parsed_comment_location)
                 exercise_df = raw_comments.parsed_comment_df
@@ -152,7 +158,8 @@ class Program:
     def concatenate_all_months(
         self,
         exercise_df:pd.DataFrame, # or None
-        month_instances:dict
+        month_instances:dict,
+        verbose:bool=False
     ):
         """
         Concatenate legacy comments with new format months
@@ -160,6 +167,8 @@ class Program:
         Args:
             exercise_df (pd.DataFrame): Legacy exercise data-frame
             month_instances (dict): month_sheet_name:str, month_instance:Month
+            verbose (bool, optional): Print the exercises logged per month.
+                Defaults to False.
         """
 
         if exercise_df is not None:
@@ -182,83 +191,18 @@ class Program:
                 "Result"
             ])
 
-        # For each month add every valid exercise to the exercise df
-        for month_instance in month_instances.values():
-            for session in month_instance.month_sessions:
-                # Not empty and not a rest day
-                if session.status["is_valid"]:
-                    for ex, result in session.exercises.items():
-                        # Skipped exercise block
-                        if ex == "" or ex == "meta":
-                            continue
-
-                        new_row = pd.DataFrame({
-                            "Date": session.date,
-                            "Exercise": ex,
-                            "Result": result
-                        }, index=[0])
-
-                        # Check if exercise_df is empty or not defined
-                        if exercise_df is None or exercise_df.empty:
-                            # If empty, assign the new row directly
-                            exercise_df = new_row
-                        else:
-                            # Append the new row to the existing DataFrame
-                            exercise_df = pd.concat([new_row, exercise_df], ignore_index=True)
-        
-        return(exercise_df.sort_values(["Date"]))
-    
-    def find_result(self, result):
-        """
-        Build a programmatic estimate of the exercise result. Long term this will be an 
-        NLP-like system of finding similar strings
-
-        Args:
-            result (float, int, string): Exercise result value
-        """
+        # For each month add every valid exercise to the log column buffers
+        exercise_log = ExerciseLog()
+        for month_name, month_instance in month_instances.items():
+            exercise_log.add_month(month_name, month_instance.month_sessions)
 
-        # If the result was written in kilos
-        if 'kg' in str(result):
-            kg_value = re.findall(r"([0-9]{1,3}([\.][0-9]{1,2})?)kg", str(result))
-            try:
-                return(max([float(v[0]) for v in kg_value]))
-            except IndexError:
-                return(0)
-            # Empty kg value
-            except ValueError:
-                return(0)
-            
-        # If it's not kilos then look for a value or a time
-        else:
-            estimated_weight = re.findall(r"([0-9]{1,3}([\.:][0-9]{1,2})?)", str(result))
-            if estimated_weight == []:
-                return(0)
-            else:
-                # If any values found are times, take the first one
-                if any([":" in v[0] for v in estimated_weight]):
-                    t_val = [v[0] for v in estimated_weight if ":" in v[0]]
-                    return(t_val[0])
-                else:
-                    return(max([float(v[0]) for v in estimated_weight]))
-            
-    def find_status(self, result):
-        """
-        Find  whether it was a 
-            Peak set (1 set of 8+ reps)
-            Working set (2+ sets of 8+ reps)
-            Static (not given)
+        self.month_row_counts = exercise_log.month_row_counts
+        print(f"\tLogged {len(exercise_log)} exercises from {len(self.month_row_counts)} months")
+        if verbose:
+            for month_name, row_count in self.month_row_counts.items():
+                print(f"\t\t{month_name}: {row_count}")
 
-        Args:
-            result (str): Exercise result
-        """
-        #! Consolidate regex
-        if re.search(r"(working)", str(result).lower()) is not None or \
-            re.search(r"(ww)", str(result).lower()) is not None:
-            return("Working")
-        if re.search(r"(peak)", str(result).lower()) is not None or \
-            re.search(r"(pw)", str(result).lower()) is not None:
-            return("Peak")
-        return("Static")
+        return(exercise_log.build(exercise_df))
     
     def enrich_logs(self, all_exercise_df:pd.DataFrame):
         """
@@ -269,10 +213,11 @@ class Program:
         """
         all_exercise_df["Date"] = all_exercise_df["Date"].dt.date
 
-        # Get kg value, if no kg value find take the next largest number
-        all_exercise_df["Weight"] = all_exercise_df["Result"].apply(self.find_result)
-        ## - Append set type (Working / Peak / Static, that priority) - ##
-        all_exercise_df["Status"] = all_exercise_df["Result"].apply(self.find_status)
+        # Get kg value, if no kg value find take the next largest number (Weight),
+        # append set type (Working / Peak / Static, that priority) (Status) and
+        # any time logged (Time). Results seen before come from the shared
+        # parser's cache, the rest are parsed together
+        all_exercise_df = ResultEnricher().enrich(all_exercise_df, self.result_parser)
 
         return(all_exercise_df)
     
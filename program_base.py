@@ -1,67 +1,46 @@
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
 from datetime import date
 from functools import cached_property
+from contextlib import contextmanager
+from gspread.utils import absolute_range_name, fill_gaps
 import gspread
 
+from api_context import ApiContext
+from rate_limiter import RateLimiter
+from spreadsheet_metadata import SpreadsheetMetadata
+from request_optimizer import RequestOptimizer
+from retry import RetryPolicy
+from run_report import RunReport
+
 class ProgramBase:
     SCOPES = [
         'https://www.googleapis.com/auth/spreadsheets',
         'https://www.googleapis.com/auth/drive'
     ]
     CREDENTIALS_PATH = 'credentials/sa_program_update.json'
+    # Most sheet ranges requested in a single values.batchGet call
+    BATCH_GET_CHUNK_SIZE = 40
+    # Buffered requests sent automatically once this many are queued
+    REQUEST_BUFFER_LIMIT = 100
+    # batchUpdate requests that add sheets, repeating them isn't safe
+    CREATE_REQUESTS = ("duplicateSheet", "addSheet")
+    # call_api labels that fetch spreadsheet metadata
+    METADATA_CALLS = ("open_by_key", "worksheets", "worksheet", "spreadsheets.get")
 
-    # Shared state
-    _gc = None
-    _initialized = False
-    _service = None
-    _creds = None
-    _current_spreadsheet_id = None  # Track the active spreadsheet_id at class level
-    
-    # Class-level caches shared across all instances
-    _g_sheet_cache = {}  # Cache g_sheet objects per spreadsheet_id
-    _worksheets_cache = {}  # Cache all worksheets list per spreadsheet_id
-    _worksheet_dict_cache = {}  # Cache worksheets as dict {name: worksheet} per spreadsheet_id
+    # Read/write quota, retry stats and stage timings shared by every instance and program in the run
+    _rate_limiter = RateLimiter()
+    _retry_policy = RetryPolicy()
+    _run_report = RunReport()
+    _request_optimizer = RequestOptimizer()
 
     def __init__(self, spreadsheet_id:str, refresh_sheet:bool=True):
         # Initialize instance-level cache for sheets by name
         self._sheet_cache = {}
-        self._merge_ranges_cache = None
-        
-        # Only initialize shared state once
-        if not ProgramBase._initialized:
-            creds = self.verify_user()
-            ProgramBase._creds = creds
-            self.init_class_variables(spreadsheet_id)
-
-        # Check if spreadsheet_id is changing at class level
-        spreadsheet_id_changed = ProgramBase._current_spreadsheet_id != spreadsheet_id
-        
-        if spreadsheet_id_changed:
-            # Clear instance caches when switching spreadsheets
-            self._sheet_cache.clear()
-            self._merge_ranges_cache = None
-        
-        # Update the active spreadsheet_id
-        ProgramBase._current_spreadsheet_id = spreadsheet_id
-        self._spreadsheet_id = spreadsheet_id
 
-    # Modify class level specific variables, not instance level
-    @classmethod
-    def init_class_variables(cls, spreadsheet_id:str):
-        """
-        Initialize the shared class-level variables. Called on
-        ProgramBase rather than cls to avoid writing variables
-        to the subclass instance
-        """
-        print("Initialising class variables")
-        ProgramBase._initialized = True
-        ProgramBase.spreadsheet_id = spreadsheet_id
-
-        # Service object to apply conditional formatting
-        ProgramBase._service = build('sheets', 'v4', credentials=ProgramBase._creds)
-        # Authorise Google Cloud access
-        ProgramBase._gc = gspread.authorize(ProgramBase._creds)
+        # API clients and cached worksheets for this spreadsheet, shared by
+        # every instance using it and isolated from other spreadsheets
+        self._spreadsheet_id = spreadsheet_id
+        with self.stage("auth"):
+            self._context = ApiContext.for_spreadsheet(spreadsheet_id, self.verify_user)
 
     def init_sheet(self, spreadsheet_id:str):
         """
@@ -69,7 +48,55 @@ class ProgramBase:
         """
         # Initialise google sheet instance
         print("Refresh gspread spreadsheet instance")
-        return(self.gc.open_by_key(spreadsheet_id))
+        with self.stage("metadata"):
+            return(self.call_api("read", "open_by_key", self.gc.open_by_key, spreadsheet_id))
+
+    def wait_for_quota(self, quota:str, cost:int=1):
+        """
+        Block until the shared rate limiter has budget for the next API call(s)
+
+        Args:
+            quota (str): "read", "write" or "drive"
+            cost (int, optional): Number of API requests about to be made. Defaults to 1.
+        """
+        return(ProgramBase._rate_limiter.acquire(quota, cost))
+
+    def call_api(self, quota:str, label:str, func, *args, cost:int=1, idempotent:bool=True, **kwargs):
+        """
+        Make a Sheets/Drive API call, waiting on the shared rate limiter before
+        each attempt and retrying quota and transient server errors
+
+        Args:
+            quota (str): "read", "write" or "drive"
+            label (str): Name the call is recorded under in the retry stats
+            func (callable): API call, called with *args and **kwargs
+            cost (int, optional): Number of API requests func makes. Defaults to 1.
+            idempotent (bool, optional): False for calls that create something,
+                which are never retried. Defaults to True.
+        """
+        return(ProgramBase._retry_policy.call(
+            label,
+            func,
+            *args,
+            before_attempt=lambda: self.wait_for_quota(quota, cost),
+            idempotent=idempotent,
+            **kwargs
+        ))
+
+    def stage(self, name:str):
+        """
+        Time a block as one of the run report's stages for this spreadsheet
+
+            with self.stage("fetch"):
+                values = self.batch_get_sheet_values(sheet_names)
+        """
+        return(ProgramBase._run_report.stage(name, self.spreadsheet_id))
+
+    @classmethod
+    def count_metadata_calls(cls) -> int:
+        """Number of metadata API calls made so far in the run."""
+        call_stats = ProgramBase._retry_policy.summary()
+        return(sum([call_stats.get(label, {}).get("calls", 0) for label in cls.METADATA_CALLS]))
     
     @property
     def spreadsheet_id(self):
@@ -78,35 +105,62 @@ class ProgramBase:
     @property
     def g_sheet(self):
         """Get or create cached g_sheet for this spreadsheet_id."""
-        sid = self.spreadsheet_id
-        if sid not in ProgramBase._g_sheet_cache:
-            print(f"Loading g_sheet for {sid}")
-            ProgramBase._g_sheet_cache[sid] = self.init_sheet(sid)
-        return ProgramBase._g_sheet_cache[sid]
+        if self._context.g_sheet is None:
+            print(f"Loading g_sheet for {self.spreadsheet_id}")
+            self._context.g_sheet = self.init_sheet(self.spreadsheet_id)
+        return self._context.g_sheet
     
     @property
     def service(self):
-        return ProgramBase._service
+        return self._context.service
     
     @property
     def gc(self):
-        if ProgramBase._gc is None:
-            raise ValueError("Google Sheets client (_gc) has not been initialized. Ensure init_class_variables() was called.")
-        return ProgramBase._gc
+        return self._context.gc
     
+    @property
+    def metadata(self) -> SpreadsheetMetadata:
+        """
+        Snapshot of every sheet's properties, merges and conditional formats,
+        loaded with one spreadsheets.get and shared across all instances of
+        the same spreadsheet.
+        """
+        if self._context.metadata is None:
+            with self.stage("metadata"):
+                response = self.call_api(
+                    "read",
+                    "spreadsheets.get",
+                    self.service.spreadsheets().get(
+                        spreadsheetId=self.spreadsheet_id,
+                        fields=SpreadsheetMetadata.FIELDS
+                    ).execute
+                )
+            self._context.metadata = SpreadsheetMetadata(response['sheets'])
+        return self._context.metadata
+
+    def invalidate_metadata(self):
+        """
+        Reload the metadata snapshot on next use, after sheets are added or merged.
+        """
+        self._context.metadata = None
+        print(f"Invalidated metadata snapshot for {self.spreadsheet_id}")
+
     @property
     def worksheets(self):
         """
-        Returns cached worksheets list for the current spreadsheet ID.
-        Shared across all instances of the same spreadsheet.
+        Returns cached worksheets list for the current spreadsheet ID, built
+        from the metadata snapshot. Shared across all instances of the same spreadsheet.
         """
-        sid = self.spreadsheet_id
-        if sid not in ProgramBase._worksheets_cache:
-            ws_list = self.g_sheet.worksheets()
-            ProgramBase._worksheets_cache[sid] = ws_list
+        if self._context.worksheets is None:
+            g_sheet = self.g_sheet
+            ws_list = [
+                gspread.Worksheet(g_sheet, properties, self.spreadsheet_id, g_sheet.client)
+                for properties in self.metadata.sheet_properties
+            ]
+            self._context.worksheets = ws_list
             # Also build the dict cache for fast lookups
-            ProgramBase._worksheet_dict_cache[sid] = {ws.title: ws for ws in ws_list}
-        return ProgramBase._worksheets_cache[sid]
+            self._context.worksheet_dict = {ws.title: ws for ws in ws_list}
+        return self._context.worksheets
     
     def get_worksheets(self):
         """Backward compatibility wrapper for worksheets property."""
@@ -119,7 +173,7 @@ class ProgramBase:
         Returns:
             list[str]: List of worksheet title strings
         """
-        return [s.title for s in self.worksheets]
+        return self.metadata.titles
     
     def get_sheet(self, sheet_name: str):
         """
@@ -135,14 +189,14 @@ class ProgramBase:
         # Ensure worksheets are cached (this builds the dict cache too)
         _ = self.worksheets
         
-        sid = self.spreadsheet_id
-        ws_dict = ProgramBase._worksheet_dict_cache.get(sid, {})
+        ws_dict = self._context.worksheet_dict
         
         if sheet_name in ws_dict:
             return ws_dict[sheet_name]
         else:
             # Fallback if not in cache (shouldn't happen if worksheets are cached)
-            return self.g_sheet.worksheet(sheet_name)
+            g_sheet = self.g_sheet
+            return self.call_api("read", "worksheet", g_sheet.worksheet, sheet_name)
 
     def invalidate_worksheet_cache(self, sheet_name: str = None):
         """
@@ -152,20 +206,16 @@ class ProgramBase:
             sheet_name (str, optional): Specific sheet name to invalidate. 
                                        If None, invalidates all sheets for this spreadsheet.
         """
-        sid = self.spreadsheet_id
         if sheet_name is None:
-            # Clear all caches for this spreadsheet
-            if sid in ProgramBase._worksheets_cache:
-                del ProgramBase._worksheets_cache[sid]
-            if sid in ProgramBase._worksheet_dict_cache:
-                del ProgramBase._worksheet_dict_cache[sid]
+            # Clear all caches for this spreadsheet, worksheets are built from the metadata
+            self._context.metadata = None
+            self._context.worksheets = None
+            self._context.worksheet_dict = {}
             self._sheet_cache.clear()
-            print(f"Invalidated all worksheet caches for {sid}")
+            print(f"Invalidated all worksheet caches for {self.spreadsheet_id}")
         else:
             # Invalidate specific worksheet
-            if sid in ProgramBase._worksheet_dict_cache:
-                if sheet_name in ProgramBase._worksheet_dict_cache[sid]:
-                    del ProgramBase._worksheet_dict_cache[sid][sheet_name]
+            self._context.worksheet_dict.pop(sheet_name, None)
             if sheet_name in self._sheet_cache:
                 del self._sheet_cache[sheet_name]
             print(f"Invalidated worksheet cache for: {sheet_name}")
@@ -174,26 +224,50 @@ class ProgramBase:
         """
         Invalidate cached merge ranges when sheets are modified.
         """
-        self._merge_ranges_cache = None
-        print(f"Invalidated merge ranges cache for {self.spreadsheet_id}")
+        self.invalidate_metadata()
 
     def duplicate_sheet(self, program_name: str, spreadsheet_id: str):
-        new_spreadsheet = self.gc.copy(
+        new_spreadsheet = self.call_api(
+            "drive",
+            "copy",
+            self.gc.copy,
             spreadsheet_id,
+            # A copy that timed out may still have been made, don't make another
+            idempotent=False,
             title=f"[Test] - Root Program:: {program_name.capitalize()} {date.today()}",
             copy_permissions=True,
             folder_id="1rdON9vpywCPYp_a_gwxzOciYVQm1DdyR"
         )
         return new_spreadsheet.id
 
+    def get_modified_time(self) -> str:
+        """
+        Drive modifiedTime of the spreadsheet, changes with any edit to any
+        sheet. Uses Drive quota rather than Sheets read quota
+        """
+        with self.stage("metadata"):
+            metadata = self.call_api(
+                "drive",
+                "get_file_drive_metadata",
+                self.gc.get_file_drive_metadata,
+                self.spreadsheet_id
+            )
+        return(metadata["modifiedTime"])
+
+    def get_sheet_ids(self) -> dict:
+        """
+        Returns:
+            dict: Dictionary mapping sheet names to their sheet IDs
+        """
+        return self.metadata.sheet_ids
+
     def find_sheet_id(self, sheet_name:str, pre_processed:bool, spreadsheet_id:str):
         """
         Get the sheet ID for a given sheet name.
-        Always uses the cached g_sheet to avoid redundant API calls.
+        Always uses the metadata snapshot to avoid redundant API calls.
         """
-        # Use the cached g_sheet property - works for both pre_processed and non-pre_processed
-        sheet_id = self.g_sheet.worksheet(sheet_name)._properties['sheetId']
-        return sheet_id
+        # Works for both pre_processed and non-pre_processed
+        return self.metadata.sheet_id(sheet_name)
 
     def verify_user(self):
         """
@@ -204,37 +278,60 @@ class ProgramBase:
             ServiceAccountCredentials: Google Sheets API credentials
         """
 
+        # Only needed for live runs, offline transports never ask for credentials
+        from oauth2client.service_account import ServiceAccountCredentials
+
         creds = ServiceAccountCredentials.from_json_keyfile_name(
             self.CREDENTIALS_PATH,
             self.SCOPES
         )
         return creds
     
+    def batch_get_sheet_values(self, sheet_names:list) -> dict:
+        """
+        Retrieve every value on each of the given sheets with one
+        values.batchGet request per BATCH_GET_CHUNK_SIZE sheets rather than
+        one request per sheet. Values are padded the same way as
+        Worksheet.get_all_values
+
+        Args:
+            sheet_names (list): List of sheet names to retrieve values for
+
+        Returns:
+            dict: Dictionary mapping sheet names to their list of lists of values
+        """
+        sheet_values = {}
+        for chunk_start in range(0, len(sheet_names), self.BATCH_GET_CHUNK_SIZE):
+            chunk_names = sheet_names[chunk_start:chunk_start+self.BATCH_GET_CHUNK_SIZE]
+            # Straight through the http client, opening the spreadsheet costs a metadata call
+            response = self.call_api(
+                "read",
+                "values_batch_get",
+                self.gc.http_client.values_batch_get,
+                self.spreadsheet_id,
+                ranges=[absolute_range_name(name) for name in chunk_names]
+            )
+
+            # Value ranges are returned in the order they were requested
+            for name, value_range in zip(chunk_names, response["valueRanges"]):
+                values = value_range.get("values", [[]])
+                try:
+                    values = fill_gaps(values)
+                except KeyError:
+                    values = [[]]
+                sheet_values[name] = values
+
+        return(sheet_values)
+
     def retrieve_all_merge_ranges(self) -> dict:
         """
         Retrieve merged cell ranges for all sheets in the spreadsheet.
-        Results are cached to avoid repeated metadata API calls.
+        Read from the metadata snapshot to avoid repeated metadata API calls.
         
         Returns:
             dict: Dictionary mapping sheet names to their merge ranges
         """
-        if self._merge_ranges_cache is None:
-            # Retrieve the full spreadsheet metadata
-            sheet_metadata = self._service.spreadsheets().get(
-                spreadsheetId=self._spreadsheet_id, 
-                fields='sheets'
-            ).execute()
-            sheets = sheet_metadata['sheets']
-
-            # Get merged ranges for all sheets by name
-            self._merge_ranges_cache = {
-                s['properties']['title'] : s.get('merges', []) \
-                    for s in sheets
-            }
-        else:
-            print(f"Using cached merge ranges for spreadsheet: {self.spreadsheet_id}")
-        
-        return self._merge_ranges_cache
+        return self.metadata.merges
 
     def retrieve_merge_ranges_for_sheets(self, sheet_names: list) -> dict:
         """
@@ -265,13 +362,103 @@ class ProgramBase:
         self, 
         requests:list
     ):
-        
+        # Drop and combine redundant formatting requests, same result on the sheet
+        requests = ProgramBase._request_optimizer.optimise(requests)
+        # A batch that adds sheets may have been applied before a timeout or
+        # server error, so it isn't retried
+        creates_sheets = any([k in self.CREATE_REQUESTS for r in requests for k in r])
+
         # Create a batch request to apply both actions
         batch_update_request = {
             'requests': requests
         }
-        res = self.g_sheet.batch_update(batch_update_request)
+        res = self.call_api(
+            "write",
+            "batch_update",
+            self.gc.http_client.batch_update,
+            self.spreadsheet_id,
+            batch_update_request,
+            idempotent=not creates_sheets
+        )
         return(res)
+
+    @property
+    def request_buffer(self):
+        """Queued requests for this spreadsheet_id, None if not buffering."""
+        return self._context.request_buffer
+
+    def start_request_buffer(self, max_requests:int=None):
+        """
+        Queue requests made through queue_requests (and merge_cells) for this
+        spreadsheet rather than sending them straight away
+
+        Args:
+            max_requests (int, optional): Flush automatically once this many
+                requests are queued. Defaults to REQUEST_BUFFER_LIMIT.
+        """
+        if self.request_buffer is None:
+            self._context.request_buffer = {
+                "requests": [],
+                "max_requests": max_requests or self.REQUEST_BUFFER_LIMIT
+            }
+
+    def queue_requests(self, requests:list):
+        """
+        Add requests to the buffer, flushing once it reaches its limit. If
+        no buffer has been started the requests are run immediately
+        """
+        buffer = self.request_buffer
+        if buffer is None:
+            return(self.run_requests(requests=requests))
+
+        buffer["requests"].extend(requests)
+        if len(buffer["requests"]) >= buffer["max_requests"]:
+            return(self.flush_requests())
+        return(None)
+
+    def flush_requests(self):
+        """
+        Send every queued request for this spreadsheet in a single batchUpdate
+        """
+        buffer = self.request_buffer
+        if buffer is None or buffer["requests"] == []:
+            return(None)
+
+        requests = buffer["requests"]
+        buffer["requests"] = []
+        print(f"\t\tSending {len(requests)} buffered requests")
+        return(self.run_requests(requests=requests))
+
+    def stop_request_buffer(self, flush:bool=True):
+        """
+        Stop buffering for this spreadsheet, sending anything still queued
+        unless flush is False
+        """
+        res = self.flush_requests() if flush else None
+        self._context.request_buffer = None
+        return(res)
+
+    @contextmanager
+    def buffered_requests(self, max_requests:int=None):
+        """
+        Buffer requests made within the block and send them together when it
+        exits. Queued requests are dropped if the block raises. Nested blocks
+        share the outer buffer
+
+            with self.buffered_requests():
+                self.merge_cells(...)
+        """
+        if self.request_buffer is not None:
+            yield
+            return
+
+        self.start_request_buffer(max_requests)
+        try:
+            yield
+        except BaseException:
+            self.stop_request_buffer(flush=False)
+            raise
+        self.stop_request_buffer()
     
     @staticmethod
     def get_clear_validation_req(
@@ -298,6 +485,38 @@ class ProgramBase:
         }
         return(req)
 
+    @staticmethod
+    def get_update_cell_request(
+        sheet_id:int,
+        row:int,
+        col:int,
+        value
+    ):
+        # Match the value type to the userEnteredValue field
+        if isinstance(value, bool):
+            entered_value = {"boolValue": value}
+        elif isinstance(value, (int, float)):
+            entered_value = {"numberValue": value}
+        elif str(value).startswith("="):
+            entered_value = {"formulaValue": str(value)}
+        else:
+            entered_value = {"stringValue": str(value)}
+
+        req = {
+            "updateCells": {
+                "start": {
+                    "sheetId": sheet_id,
+                    "rowIndex": row,
+                    "columnIndex": col
+                },
+                "rows": [
+                    {"values": [{"userEnteredValue": entered_value}]}
+                ],
+                "fields": "userEnteredValue"
+            }
+        }
+        return(req)
+
     @staticmethod
     def get_merge_request(
         sheet_id:int,
@@ -448,13 +667,19 @@ class ProgramBase:
                 merge_request
             ]
 
-        res = self.run_requests(
-            requests=requests
-        )
-        
         # Edit the top left cell if requested
         if new_value:
-            self.g_sheet.worksheet(
-                sheet_name
-            ).update_cell(start_row+1, start_col+1, new_value)
+            requests.append(
+                self.get_update_cell_request(
+                    sheet_id,
+                    start_row,
+                    start_col,
+                    new_value
+                )
+            )
+
+        # Sent immediately unless a request buffer has been started
+        res = self.queue_requests(
+            requests=requests
+        )
         return(res)
\ No newline at end of file
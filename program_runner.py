@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_context import ApiContext
+from program import Program
+
+class ProgramRunner:
+    def __init__(self, program_names:tuple[str], max_workers:int=None, **program_kwargs):
+        """
+        Update several programs at once on a thread pool. Each program's
+        spreadsheet has its own API context, while the read/write quota is
+        shared through ProgramBase's rate limiter
+
+        Args:
+            program_names (tuple[str]): Programs given in PROGRAM_SPECS
+            max_workers (int, optional): Programs updated at once. Defaults to
+                one thread per program.
+            program_kwargs: Passed to every Program
+        """
+        assert len(set(program_names)) == len(program_names), \
+            f"Each program can only be run once at a time. Given: {program_names}"
+
+        self.program_names = program_names
+        self.max_workers = max_workers or len(program_names)
+        self.program_kwargs = program_kwargs
+
+        self.programs = {}
+        self.failures = {}
+
+    def run_program(self, program_name:str) -> Program:
+        prog = Program(program_name=program_name, **self.program_kwargs)
+        # Drop this program's clients and cached worksheets now it's finished
+        ApiContext.release(prog.sheet.spreadsheet_id)
+        return(prog)
+
+    def run(self) -> dict:
+        """
+        Run every program, one failing doesn't stop the others
+
+        Returns:
+            dict: program_name:Program for each program that completed
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.run_program, program_name): program_name
+                for program_name in self.program_names
+            }
+            for future in as_completed(futures):
+                program_name = futures[future]
+                try:
+                    self.programs[program_name] = future.result()
+                    print(f"\nFinished program: {program_name}")
+                except Exception as error:
+                    self.failures[program_name] = error
+                    print(f"\nProgram failed: {program_name} - {type(error).__name__}: {error}")
+
+        return(self.programs)
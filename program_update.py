@@ -1,7 +1,4 @@
-from program import Program
-from program_base import ProgramBase
 import argparse
-import time
 
 # Launch Agent notes
 
@@ -17,6 +14,8 @@ import time
 
 # Currently updating sheets
 known_programs = ('lew', 'hope',)
+# Programs that only exist in a --fake fixture
+sample_programs = ('sample',)
 
 if __name__ == "__main__":
     
@@ -45,11 +44,83 @@ if __name__ == "__main__":
         '--duplicate', action=argparse.BooleanOptionalAction,
         help="Duplicate program before running any updates"
     )
+    parser.add_argument(
+        '--max_workers', type=int, default=None,
+        help="Programs to update at once with --program all, defaults to all of them"
+    )
+    parser.add_argument(
+        '--parse_workers', type=int, default=None,
+        help="Worker processes for parsing months, shared by every program. Defaults to 1 (in-process)"
+    )
+    parser.add_argument(
+        '--parse_executor', choices=("process", "thread"), default="process",
+        help="Parse months on worker processes or threads"
+    )
+    parser.add_argument(
+        '--reuse_sessions', action=argparse.BooleanOptionalAction, default=False,
+        help="Reuse unchanged sessions from a snapshot of the last run rather than reparsing them"
+    )
+    parser.add_argument(
+        '--refresh_cache', action=argparse.BooleanOptionalAction, default=False,
+        help="Re-read every month rather than reusing past months from the grid cache"
+    )
+    parser.add_argument(
+        '--months_ahead', type=int, default=1,
+        help="Months after the current one to add sheets for, e.g. 12 to provision a year ahead"
+    )
+
+    parser.add_argument(
+        '--record', default=None, metavar='CASSETTE',
+        help="Record every API request and response made during the run to a cassette file"
+    )
+    parser.add_argument(
+        '--replay', default=None, metavar='CASSETTE',
+        help="Run offline, serving API requests from a recorded cassette"
+    )
+    parser.add_argument(
+        '--fake', default=None, metavar='FIXTURE',
+        help="Run offline against an in-memory spreadsheet seeded from a JSON fixture"
+    )
+
+    parser.add_argument(
+        '--report', default=None, metavar='PATH',
+        help="Performance report path, defaults to reports/run_<start time>.json"
+    )
 
     args = parser.parse_args()
 
-    assert args.program in known_programs or args.program == "all", \
+    # Imported after parsing so --help and bad arguments don't wait on pandas,
+    # gspread and the Google API clients
+    from program import Program
+    from program_base import ProgramBase
+    from program_runner import ProgramRunner
+    from sheet import Sheet
+    from rate_limiter import RateLimiter
+    from api_context import ApiContext
+    from transport import RecordingTransport, ReplayTransport, FakeTransport
+
+    assert args.program in (*known_programs, *sample_programs) or args.program == "all", \
         f'Program name should be one of {known_programs}'
+    assert args.program not in sample_programs or args.fake, \
+        f'The {args.program} program only exists offline, run it with --fake'
+
+    assert sum([bool(args.record), bool(args.replay), bool(args.fake)]) <= 1, \
+        'Only one of --record, --replay and --fake can be used'
+
+    if args.record:
+        ApiContext.use_transport(RecordingTransport(args.record))
+    elif args.replay or args.fake:
+        transport = ReplayTransport(args.replay) if args.replay else FakeTransport(args.fake)
+        ApiContext.use_transport(transport)
+        # Offline calls don't count against any quota, never wait so runs time consistently
+        ProgramBase._rate_limiter = RateLimiter({quota: 10**9 for quota in RateLimiter.DEFAULT_LIMITS})
+
+    if args.parse_workers is not None:
+        Sheet.PARSE_WORKERS = args.parse_workers
+    Sheet.PARSE_EXECUTOR = args.parse_executor
+    Sheet.REUSE_SESSIONS = args.reuse_sessions
+    Sheet.REFRESH_GRID_CACHE = args.refresh_cache
+    Program.MONTHS_AHEAD = args.months_ahead
 
     ### --- Make Updates to the Program Sheet --- ###
 
@@ -87,31 +158,50 @@ if __name__ == "__main__":
     #!  - Store Template sheets in a seperate document with specified colours 
     #!      and session numbers
 
-    if args.program == "all":
-        for i, p in enumerate(known_programs):
-            # Add delay between programs to avoid API rate limiting
-            if i > 0:
-                print("\nWaiting 60 seconds before next program to avoid API rate limits...")
-                time.sleep(60)
-            
-            # Clear caches before each program to avoid cross-program contamination
-            ProgramBase._g_sheet_cache.clear()
-            ProgramBase._worksheets_cache.clear()
-            ProgramBase._worksheet_dict_cache.clear()
-            ProgramBase._current_spreadsheet_id = None
-            ProgramBase._initialized = False  # Reset initialized flag so init_class_variables runs
-            
-            prog = Program(
-                program_name=p,
+    failed_programs = []
+    try:
+        if args.program == "all":
+            # Programs run concurrently, each with its own API clients and caches.
+            # API rate limits are handled by ProgramBase's shared rate limiter, which
+            # only waits when the next call would exceed the per-minute quota
+            runner = ProgramRunner(
+                known_programs,
+                max_workers=args.max_workers,
                 reparse_legacy=args.reparse_legacy,
                 verbose=args.verbose,
                 sheet_names=args.sheet_names
             )
-    else:
-        prog = Program(
-            program_name=args.program,
-            reparse_legacy=args.reparse_legacy,
-            verbose=args.verbose,
-            sheet_names=args.sheet_names,
-            duplicate=args.duplicate
-        )
\ No newline at end of file
+            runner.run()
+            failed_programs = list(runner.failures.keys())
+        else:
+            prog = Program(
+                program_name=args.program,
+                reparse_legacy=args.reparse_legacy,
+                verbose=args.verbose,
+                sheet_names=args.sheet_names,
+                duplicate=args.duplicate
+            )
+    finally:
+        # Save the cassette when recording, even if a program failed part way
+        ApiContext.transport.close()
+        Sheet.shutdown_parse_executor()
+
+    print(f"API quota usage: {ProgramBase._rate_limiter.summary()}")
+    print(f"API retries: {ProgramBase._retry_policy.summary()}")
+    print(f"Metadata API calls: {ProgramBase.count_metadata_calls()}")
+    print(f"HTTP requests: {ApiContext.metrics.total_calls()}")
+
+    ProgramBase._run_report.write(
+        args.report,
+        programs=list(known_programs) if args.program == "all" else [args.program],
+        failed_programs=failed_programs,
+        http_requests=ApiContext.metrics.summary(),
+        api_calls=ProgramBase._retry_policy.summary(),
+        metadata_calls=ProgramBase.count_metadata_calls(),
+        quota=ProgramBase._rate_limiter.summary(),
+        batch_update_requests=ProgramBase._request_optimizer.summary(),
+        result_parser=Program.result_parser.cache_info()
+    )
+
+    if failed_programs:
+        raise SystemExit(f"Failed programs: {', '.join(failed_programs)}")
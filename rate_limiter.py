@@ -0,0 +1,77 @@
+import threading
+import time
+
+class RateLimiter:
+    # Sheets (read / write) and Drive API per-user quotas, requests per minute
+    DEFAULT_LIMITS = {
+        "read": 60,
+        "write": 60,
+        "drive": 12000
+    }
+
+    def __init__(self, limits:dict=None, period:float=60.0):
+        """
+        Token bucket per quota. Each bucket holds up to its per-period limit
+        and refills continuously, so calls only wait when the next one would
+        go over the budget for the last period. Safe to share between threads
+
+        Args:
+            limits (dict, optional): quota_name:requests_per_period.
+                Defaults to DEFAULT_LIMITS.
+            period (float, optional): Quota period in seconds. Defaults to 60.
+        """
+        self.limits = dict(limits or self.DEFAULT_LIMITS)
+        self.period = period
+        self._lock = threading.Lock()
+        self._tokens = {quota: float(limit) for quota, limit in self.limits.items()}
+        self._last_refill = {quota: time.monotonic() for quota in self.limits}
+
+        # Usage stats per quota
+        self.calls = {quota: 0 for quota in self.limits}
+        self.waited = {quota: 0.0 for quota in self.limits}
+
+    def _refill(self, quota:str, now:float):
+        rate = self.limits[quota]/self.period
+        elapsed = now - self._last_refill[quota]
+        self._tokens[quota] = min(
+            self.limits[quota],
+            self._tokens[quota] + elapsed*rate
+        )
+        self._last_refill[quota] = now
+
+    def acquire(self, quota:str, cost:int=1) -> float:
+        """
+        Take cost tokens from the quota's bucket, blocking until they are
+        available. Tokens are reserved before waiting so concurrent callers
+        queue in order rather than racing for the refill
+
+        Args:
+            quota (str): Quota name, e.g. "read" or "write"
+            cost (int, optional): Number of API requests. Defaults to 1.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        assert quota in self.limits, f"Unknown quota: {quota}"
+
+        with self._lock:
+            self._refill(quota, time.monotonic())
+            self._tokens[quota] -= cost
+            # Negative tokens are requests already promised from future refills
+            wait = max(0.0, -self._tokens[quota]*self.period/self.limits[quota])
+            self.calls[quota] += cost
+            self.waited[quota] += wait
+
+        if wait > 0:
+            print(f"\t\tWaiting {wait:.1f}s for {quota} quota")
+            time.sleep(wait)
+        return(wait)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return({
+                quota: {
+                    "calls": self.calls[quota],
+                    "waited_seconds": round(self.waited[quota], 2)
+                } for quota in self.limits
+            })
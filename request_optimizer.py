@@ -0,0 +1,300 @@
+import threading
+import json
+
+INF = float("inf")
+
+class RequestOptimizer:
+    # Requests whose cells and fields are known. Anything else (duplicateSheet,
+    # updateSheetProperties, ...) is left in place and nothing moves across it
+    CELL_REQUESTS = ("repeatCell", "updateCells", "mergeCells", "unmergeCells")
+
+    def __init__(self):
+        """
+        Shrink a batchUpdate request list before it's sent. Requests are only
+        dropped, combined or moved where the result on the sheet is the same
+        as sending them as given:
+            - repeatCells entirely overwritten by a later repeatCell are dropped
+            - repeatCells with identical formatting whose ranges are adjacent
+              or overlapping (and form a rectangle) are combined into one
+            - requests are grouped by sheet and type without reordering any
+              two requests that touch the same fields of the same cells
+        """
+        self._lock = threading.Lock()
+        self.requests_in = 0
+        self.requests_out = 0
+
+    ### --- Request Footprints --- ###
+
+    @staticmethod
+    def parse_fields(fields:str) -> frozenset:
+        """
+        Field mask to a set of dotted paths, e.g.
+        "userEnteredFormat(backgroundColor,borders)" ->
+        {"userEnteredFormat.backgroundColor", "userEnteredFormat.borders"}
+        """
+        paths = set()
+        prefixes = [""]
+        current = ""
+        for char in fields.replace(" ", "") + ",":
+            if char == "(":
+                prefixes.append(prefixes[-1] + current + ".")
+                current = ""
+            elif char in ",)":
+                if current:
+                    paths.add(prefixes[-1] + current)
+                current = ""
+                if char == ")":
+                    prefixes.pop()
+            else:
+                current += char
+        return(frozenset(paths))
+
+    @staticmethod
+    def fields_overlap(fields_a:frozenset, fields_b:frozenset) -> bool:
+        for a in fields_a:
+            for b in fields_b:
+                if a == "*" or b == "*" or a == b or a.startswith(b + ".") or b.startswith(a + "."):
+                    return(True)
+        return(False)
+
+    @staticmethod
+    def fields_cover(fields_a:frozenset, fields_b:frozenset) -> bool:
+        """Whether writing fields_a overwrites everything written by fields_b"""
+        return(all([
+            any([a == "*" or a == b or b.startswith(a + ".") for a in fields_a])
+            for b in fields_b
+        ]))
+
+    @staticmethod
+    def get_rect(grid_range:dict) -> tuple:
+        """(sheet_id, start_row, end_row, start_col, end_col), unbounded ends are infinite"""
+        return((
+            grid_range.get("sheetId", 0),
+            grid_range.get("startRowIndex", 0),
+            grid_range.get("endRowIndex", INF),
+            grid_range.get("startColumnIndex", 0),
+            grid_range.get("endColumnIndex", INF)
+        ))
+
+    def footprint(self, request:dict):
+        """
+        Cells and fields a request writes, (rect, fields). None if unknown,
+        in which case the request is treated as touching everything
+        """
+        (request_type, body), = request.items()
+        if request_type not in self.CELL_REQUESTS:
+            return(None)
+
+        if request_type == "repeatCell":
+            return((self.get_rect(body["range"]), self.parse_fields(body["fields"])))
+
+        if request_type == "updateCells":
+            if "range" in body:
+                rect = self.get_rect(body["range"])
+            else:
+                start = body["start"]
+                rows = body.get("rows", [])
+                width = max([len(row.get("values", [])) for row in rows] + [0])
+                rect = (
+                    start.get("sheetId", 0),
+                    start.get("rowIndex", 0),
+                    start.get("rowIndex", 0) + len(rows),
+                    start.get("columnIndex", 0),
+                    start.get("columnIndex", 0) + width
+                )
+            return((rect, self.parse_fields(body["fields"])))
+
+        # Merging keeps only the top left value and format, it touches every field
+        return((self.get_rect(body["range"]), frozenset(["*"])))
+
+    @staticmethod
+    def rects_overlap(rect_a:tuple, rect_b:tuple) -> bool:
+        return(
+            rect_a[0] == rect_b[0] and
+            rect_a[1] < rect_b[2] and rect_b[1] < rect_a[2] and
+            rect_a[3] < rect_b[4] and rect_b[3] < rect_a[4]
+        )
+
+    @staticmethod
+    def rect_contains(rect_a:tuple, rect_b:tuple) -> bool:
+        return(
+            rect_a[0] == rect_b[0] and
+            rect_a[1] <= rect_b[1] and rect_b[2] <= rect_a[2] and
+            rect_a[3] <= rect_b[3] and rect_b[4] <= rect_a[4]
+        )
+
+    @staticmethod
+    def rect_union(rect_a:tuple, rect_b:tuple):
+        """Union of the two rectangles if it is itself a rectangle, otherwise None"""
+        if rect_a[0] != rect_b[0]:
+            return(None)
+        same_rows = rect_a[1:3] == rect_b[1:3]
+        same_cols = rect_a[3:5] == rect_b[3:5]
+        # Touching or overlapping along the other axis
+        rows_touch = rect_a[1] <= rect_b[2] and rect_b[1] <= rect_a[2]
+        cols_touch = rect_a[3] <= rect_b[4] and rect_b[3] <= rect_a[4]
+        if not ((same_rows and cols_touch) or (same_cols and rows_touch)):
+            return(None)
+        return((
+            rect_a[0],
+            min(rect_a[1], rect_b[1]), max(rect_a[2], rect_b[2]),
+            min(rect_a[3], rect_b[3]), max(rect_a[4], rect_b[4])
+        ))
+
+    def conflicts(self, footprint_a, footprint_b) -> bool:
+        """Whether the two requests could give a different result if swapped"""
+        if footprint_a is None or footprint_b is None:
+            return(True)
+        rect_a, fields_a = footprint_a
+        rect_b, fields_b = footprint_b
+        return(self.rects_overlap(rect_a, rect_b) and self.fields_overlap(fields_a, fields_b))
+
+    ### --- Passes --- ###
+
+    def drop_overwritten(self, requests:list, footprints:list) -> tuple[list, list]:
+        """
+        Drop repeatCells whose cells and fields are all overwritten by a later
+        repeatCell, with no unknown request (e.g. duplicateSheet) in between
+        """
+        keep = [True]*len(requests)
+        for i, request in enumerate(requests):
+            if "repeatCell" not in request:
+                continue
+            rect_i, fields_i = footprints[i]
+            for j in range(i + 1, len(requests)):
+                if footprints[j] is None:
+                    break
+                if "repeatCell" in requests[j]:
+                    rect_j, fields_j = footprints[j]
+                    if self.rect_contains(rect_j, rect_i) and self.fields_cover(fields_j, fields_i):
+                        keep[i] = False
+                        break
+
+        return(
+            [r for r, k in zip(requests, keep) if k],
+            [f for f, k in zip(footprints, keep) if k]
+        )
+
+    @staticmethod
+    def format_key(request:dict) -> str:
+        body = request["repeatCell"]
+        return(json.dumps([body["range"].get("sheetId", 0), body.get("cell"), body["fields"]], sort_keys=True))
+
+    def can_move(self, footprints:list, frm:int, to:int, footprint) -> bool:
+        """Whether a request with footprint can move from index frm to index to"""
+        low, high = sorted([frm, to])
+        return(not any([self.conflicts(footprint, footprints[k]) for k in range(low + 1, high)]))
+
+    def combine_ranges(self, requests:list, footprints:list) -> tuple[list, list]:
+        """
+        Combine repeatCells with the same formatting whose ranges form a
+        rectangle together, until no more can be combined
+        """
+        requests = list(requests)
+        footprints = list(footprints)
+        combined = True
+        while combined:
+            combined = False
+            for i in range(len(requests)):
+                if "repeatCell" not in requests[i]:
+                    continue
+                key_i = self.format_key(requests[i])
+                for j in range(i + 1, len(requests)):
+                    if "repeatCell" not in requests[j] or self.format_key(requests[j]) != key_i:
+                        continue
+                    union = self.rect_union(footprints[i][0], footprints[j][0])
+                    if union is None:
+                        continue
+                    # The combined request takes i's place, so j has to be able
+                    # to move back to i, or i forward to j
+                    if self.can_move(footprints, j, i, footprints[j]):
+                        position = i
+                    elif self.can_move(footprints, i, j, footprints[i]):
+                        position = j
+                    else:
+                        continue
+
+                    new_request = json.loads(json.dumps(requests[i]))
+                    new_range = new_request["repeatCell"]["range"]
+                    for key, value in zip(
+                        ("startRowIndex", "endRowIndex", "startColumnIndex", "endColumnIndex"), union[1:]
+                    ):
+                        if value == INF:
+                            new_range.pop(key, None)
+                        else:
+                            new_range[key] = value
+                    new_footprint = (union, footprints[i][1])
+
+                    requests[position], footprints[position] = new_request, new_footprint
+                    other = j if position == i else i
+                    del requests[other]
+                    del footprints[other]
+                    combined = True
+                    break
+                if combined:
+                    break
+
+        return(requests, footprints)
+
+    def group_requests(self, requests:list, footprints:list) -> list:
+        """
+        Reorder so requests of the same type on the same sheet are sent
+        together, never swapping two conflicting requests. Each request goes
+        as soon as everything before it that it conflicts with has gone,
+        preferring one that continues the current group, then the earliest
+        """
+        # Conflicting earlier requests still to be sent, per request
+        waiting_on = [0]*len(requests)
+        followers = [[] for _ in requests]
+        for j in range(len(requests)):
+            for i in range(j):
+                if self.conflicts(footprints[i], footprints[j]):
+                    waiting_on[j] += 1
+                    followers[i].append(j)
+
+        ready = [i for i in range(len(requests)) if waiting_on[i] == 0]
+        ordered = []
+        last_group = None
+        while ready:
+            chosen = min(ready)
+            for index in sorted(ready):
+                if self.group(requests[index], footprints[index]) == last_group:
+                    chosen = index
+                    break
+
+            last_group = self.group(requests[chosen], footprints[chosen])
+            ordered.append(requests[chosen])
+            ready.remove(chosen)
+            for follower in followers[chosen]:
+                waiting_on[follower] -= 1
+                if waiting_on[follower] == 0:
+                    ready.append(follower)
+
+        return(ordered)
+
+    @staticmethod
+    def group(request:dict, footprint) -> tuple:
+        (request_type, _), = request.items()
+        return((footprint[0][0] if footprint is not None else None, request_type))
+
+    def optimise(self, requests:list) -> list:
+        """
+        Args:
+            requests (list): batchUpdate requests in the order they'd be sent
+
+        Returns:
+            list: Requests with the same effect, no longer than requests
+        """
+        footprints = [self.footprint(request) for request in requests]
+        optimised, footprints = self.drop_overwritten(requests, footprints)
+        optimised, footprints = self.combine_ranges(optimised, footprints)
+        optimised = self.group_requests(optimised, footprints)
+
+        with self._lock:
+            self.requests_in += len(requests)
+            self.requests_out += len(optimised)
+        return(optimised)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return({"requests_in": self.requests_in, "requests_out": self.requests_out})
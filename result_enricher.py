@@ -0,0 +1,105 @@
+import pandas as pd
+import numpy as np
+import re
+
+class ResultEnricher:
+    # Same patterns as the original Program.find_result and Program.find_status, compiled once
+    KG_PATTERN = re.compile(r"([0-9]{1,3}(?:[\.][0-9]{1,2})?)kg")
+    VALUE_PATTERN = re.compile(r"([0-9]{1,3}(?:[\.:][0-9]{1,2})?)")
+    WORKING_PATTERN = re.compile(r"working|ww")
+    PEAK_PATTERN = re.compile(r"peak|pw")
+
+    def enrich(self, log_df:pd.DataFrame, result_parser=None) -> pd.DataFrame:
+        """
+        Add Weight, Status and Time columns for every logged result in a
+        handful of vectorised string passes. Weight and Status match the
+        values of the original per-row find_result and find_status
+
+        Args:
+            log_df (pd.DataFrame): Logs with a Result column
+            result_parser (ResultParser, optional): Cache of parsed results,
+                only results it hasn't seen are parsed. Defaults to None.
+        """
+        # Work on a positional index so extractall groups line up with rows
+        results = pd.Series(
+            log_df["Result"].to_numpy(dtype=object).astype(str),
+            dtype=object
+        )
+
+        if result_parser is None:
+            parsed = self.parse(results)
+        else:
+            parsed = result_parser.parse_all(results)
+        # Infer the same dtype Series.apply would have given
+        log_df["Weight"] = pd.Series(parsed["Weight"].tolist()).to_numpy()
+        log_df["Status"] = parsed["Status"].to_numpy()
+        log_df["Time"] = parsed["Time"].to_numpy()
+
+        return(log_df)
+
+    def parse(self, results:pd.Series) -> pd.DataFrame:
+        """
+        Weight, Status and Time of each result, Weight left as object values
+
+        Args:
+            results (pd.Series): Results as strings with a RangeIndex
+        """
+        weight, time_value = self.find_weights(results)
+        return(pd.DataFrame({
+            "Weight": weight,
+            "Status": self.find_statuses(results),
+            "Time": time_value
+        }))
+
+    def find_weights(self, results:pd.Series) -> tuple[pd.Series, pd.Series]:
+        """
+        Kilo values take priority, then the first time value, then the
+        largest plain number, otherwise 0
+
+        Args:
+            results (pd.Series): Results as strings with a RangeIndex
+
+        Returns:
+            tuple[pd.Series, pd.Series]: Weight and Time columns
+        """
+        has_kg = results.str.contains("kg", regex=False)
+
+        # Largest kilo value for rows mentioning kg
+        kg_values = results[has_kg].str.extractall(self.KG_PATTERN)[0]
+        kg_max = kg_values.astype(float).groupby(level=0).max()
+
+        # Any other number or time for rows without kg
+        values = results[~has_kg].str.extractall(self.VALUE_PATTERN)[0]
+        is_time = values.str.contains(":", regex=False)
+        first_time = values[is_time].groupby(level=0).first()
+        value_max = values[~is_time].astype(float).groupby(level=0).max()
+        # A time anywhere in the result is used over any plain value
+        value_max = value_max[~value_max.index.isin(first_time.index)]
+
+        weight = pd.Series(0, index=results.index, dtype=object)
+        weight[kg_max.index] = kg_max.to_numpy()
+        weight[value_max.index] = value_max.to_numpy()
+        weight[first_time.index] = first_time.to_numpy()
+
+        time_value = pd.Series(None, index=results.index, dtype=object)
+        time_value[first_time.index] = first_time.to_numpy()
+
+        return(weight, time_value)
+
+    def find_statuses(self, results:pd.Series) -> pd.Series:
+        """
+        Working takes priority over Peak, anything else is Static
+
+        Args:
+            results (pd.Series): Results as strings
+        """
+        lower_results = results.str.lower()
+        status = np.select(
+            [
+                lower_results.str.contains(self.WORKING_PATTERN),
+                lower_results.str.contains(self.PEAK_PATTERN)
+            ],
+            ["Working", "Peak"],
+            default="Static"
+        )
+        return(pd.Series(status, index=results.index, dtype=object))
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+import threading
+
+import pandas as pd
+
+from result_enricher import ResultEnricher
+
+class ResultParser:
+    COLUMNS = ("Weight", "Status", "Time")
+
+    def __init__(self, max_size:int=4096):
+        """
+        Parsed (weight, status, time) of logged results, keeping the most
+        recently seen results in a bounded LRU cache. Most results repeat
+        across sessions ("Working weight 60kg") so are only parsed once,
+        results not in the cache are parsed together by ResultEnricher
+
+        Args:
+            max_size (int, optional): Most results held in the cache.
+                Defaults to 4096.
+        """
+        assert max_size > 0, "Cache max_size must be positive"
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._enricher = ResultEnricher()
+        # Programs may be parsed on several threads at once
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalise(result) -> str:
+        """
+        Cache key for a result. Whitespace runs are collapsed, which can't
+        change the outcome as none of the patterns span whitespace
+        """
+        return(" ".join(str(result).split()))
+
+    def parse_all(self, results:pd.Series) -> pd.DataFrame:
+        """
+        Weight, Status and Time of every result. Each result is a hit if
+        it's already cached or repeats an earlier one, a miss if it has to
+        be parsed
+
+        Args:
+            results (pd.Series): Results as strings
+
+        Returns:
+            pd.DataFrame: Weight, Status and Time columns on a RangeIndex
+        """
+        keys = [self.normalise(r) for r in results]
+        unique_keys = list(dict.fromkeys(keys))
+
+        parsed = {}
+        with self._lock:
+            for key in unique_keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    parsed[key] = self._cache[key]
+        missing = [key for key in unique_keys if key not in parsed]
+
+        if missing != []:
+            missing_parsed = self._enricher.parse(pd.Series(missing, dtype=object))
+            parsed.update(zip(missing, missing_parsed.itertuples(index=False, name=None)))
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            for key in missing:
+                self._cache[key] = parsed[key]
+            while len(self._cache) > self.max_size:
+                # Drop the least recently used result
+                self._cache.popitem(last=False)
+
+        return(pd.DataFrame([parsed[key] for key in keys], columns=self.COLUMNS))
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return({
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hit_rate": self.hits/lookups if lookups else 0
+            })
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
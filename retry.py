@@ -0,0 +1,125 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests.exceptions
+import threading
+import gspread
+import random
+import time
+
+class RetryPolicy:
+    # Quota exceeded and transient server errors
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_retries:int=5,
+        base_delay:float=1.0,
+        max_delay:float=64.0
+    ):
+        """
+        Retry Sheets/Drive calls that fail with a quota or transient server
+        error using capped exponential backoff with full jitter. A Retry-After
+        header from the API is used as the minimum wait
+
+        Args:
+            max_retries (int, optional): Retries before the error is raised. Defaults to 5.
+            base_delay (float, optional): Backoff for the first retry in seconds. Defaults to 1.
+            max_delay (float, optional): Cap on the backoff in seconds. Defaults to 64.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+        # Per-call stats, call_label:count
+        self.calls = {}
+        self.retries = {}
+
+    @classmethod
+    def get_retry_status(cls, error:Exception):
+        """
+        Return (status, retry_after_seconds) if the error should be retried,
+        otherwise None
+        """
+        from googleapiclient.errors import HttpError
+
+        if isinstance(error, gspread.exceptions.APIError):
+            status = error.response.status_code
+            headers = error.response.headers
+        elif isinstance(error, HttpError):
+            status = error.resp.status
+            # httplib2 responses use lower case header keys
+            headers = error.resp
+        elif isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return((None, None))
+        else:
+            return(None)
+
+        if status not in cls.RETRY_STATUSES:
+            return(None)
+        return((status, cls.parse_retry_after(headers.get("retry-after"))))
+
+    @staticmethod
+    def parse_retry_after(retry_after:str):
+        """Retry-After may be given in seconds or as an HTTP date."""
+        if retry_after is None:
+            return(None)
+        try:
+            return(max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+        try:
+            retry_dt = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return(None)
+        return(max(0.0, (retry_dt - datetime.now(timezone.utc)).total_seconds()))
+
+    def get_delay(self, attempt:int, retry_after:float=None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay*(2**attempt)))
+        if retry_after is not None:
+            return(max(retry_after, backoff))
+        return(backoff)
+
+    def call(self, label:str, func, *args, before_attempt=None, idempotent:bool=True, **kwargs):
+        """
+        Call func(*args, **kwargs), retrying on quota and transient errors
+
+        Args:
+            label (str): Name the call is recorded under in the stats
+            func (callable): API call to make
+            before_attempt (callable, optional): Run before every attempt,
+                used to take from the rate limiter. Defaults to None.
+            idempotent (bool, optional): Whether repeating the call is safe.
+                Calls that create something are never retried, a timeout or
+                server error may come after the call took effect. Defaults to True.
+        """
+        with self._lock:
+            self.calls[label] = self.calls.get(label, 0) + 1
+
+        attempt = 0
+        while True:
+            if before_attempt is not None:
+                before_attempt()
+            try:
+                return(func(*args, **kwargs))
+            except Exception as error:
+                retry_status = self.get_retry_status(error)
+                if retry_status is None or not idempotent or attempt >= self.max_retries:
+                    raise
+
+                status, retry_after = retry_status
+                delay = self.get_delay(attempt, retry_after)
+                attempt += 1
+                with self._lock:
+                    self.retries[label] = self.retries.get(label, 0) + 1
+                print(f"\t\t{label} failed ({status or type(error).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return({
+                label: {
+                    "calls": calls,
+                    "retries": self.retries.get(label, 0)
+                } for label, calls in self.calls.items()
+            })
@@ -0,0 +1,132 @@
+from numbers import Real
+import hashlib
+import json
+import os
+
+from gspread.utils import rowcol_to_a1
+from pandas import DataFrame
+import pandas as pd
+
+class RowSnapshot:
+    CACHE_DIR = 'cache'
+    # Bump when the row hashing changes so older snapshots are ignored
+    VERSION = 1
+
+    def __init__(self, spreadsheet_id:str, tab_name:str, cache_dir:str=None):
+        """
+        Hash of every row last written to a tab, header first. Rows of the
+        next write are compared against it so only changed and appended rows
+        are sent rather than the whole tab
+
+        Args:
+            spreadsheet_id (str): Spreadsheet the tab belongs to
+            tab_name (str): Tab the rows were written to
+            cache_dir (str, optional): Directory for snapshot files. Defaults to CACHE_DIR.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.tab_name = tab_name
+        tab_key = hashlib.sha1(tab_name.encode()).hexdigest()[:8]
+        self.snapshot_path = os.path.join(cache_dir or self.CACHE_DIR, f"{spreadsheet_id}.{tab_key}.rows.json")
+
+        # Header row as written, None if nothing has been written yet
+        self.header = None
+        self.row_hashes = []
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, json.JSONDecodeError):
+            print(f"\tIgnoring unreadable row snapshot: {self.snapshot_path}")
+            return
+
+        if snapshot.get("version") == self.VERSION:
+            self.header = snapshot["header"]
+            self.row_hashes = snapshot["row_hashes"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        # Write to a temporary file first so an interrupted run can't corrupt the snapshot
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump({
+                "version": self.VERSION,
+                "tab_name": self.tab_name,
+                "header": self.header,
+                "row_hashes": self.row_hashes
+            }, snapshot_file)
+        os.replace(tmp_path, self.snapshot_path)
+
+    @staticmethod
+    def cell_value(value):
+        """Cell value as set_with_dataframe writes it, as a JSON type"""
+        if pd.isnull(value) is True:
+            return("")
+        if isinstance(value, Real):
+            # numpy scalars to the Python number they hold
+            return(value.item() if hasattr(value, "item") else value)
+        value = str(value)
+        # A leading apostrophe would be read as the text prefix, keep it
+        return(f"'{value}" if value.startswith("'") else value)
+
+    @classmethod
+    def sheet_rows(cls, df:DataFrame) -> list[list]:
+        """Header and data rows of the data frame as written to the sheet"""
+        rows = [[cls.cell_value(c) for c in df.columns]]
+        for value_row in df.to_numpy("object"):
+            rows.append([cls.cell_value(v) for v in value_row])
+        return(rows)
+
+    @staticmethod
+    def row_hash(row:list) -> str:
+        return(hashlib.sha1(json.dumps(row).encode()).hexdigest()[:16])
+
+    def matches_grid(self, row_count:int, col_count:int) -> bool:
+        """
+        Whether the tab is still the size it was written at, otherwise it's
+        been changed since and the snapshot can't be trusted
+        """
+        return(
+            self.header is not None
+            and row_count == len(self.row_hashes)
+            and col_count == len(self.header)
+        )
+
+    def changed_ranges(self, rows:list[list]) -> list[tuple]:
+        """
+        (start_row, end_row) of each run of rows, 0 indexed and end exclusive,
+        that differs from or is appended to the snapshot. None if the header
+        changed and the whole tab needs rewriting
+        """
+        if self.header is None or rows[0] != self.header:
+            return(None)
+
+        changed = [
+            i for i, row in enumerate(rows)
+            if i >= len(self.row_hashes) or self.row_hash(row) != self.row_hashes[i]
+        ]
+        ranges = []
+        for i in changed:
+            if ranges and ranges[-1][1] == i:
+                ranges[-1] = (ranges[-1][0], i + 1)
+            else:
+                ranges.append((i, i + 1))
+        return(ranges)
+
+    def value_ranges(self, rows:list[list], ranges:list[tuple]) -> list[dict]:
+        """values.batchUpdate data for the given row ranges"""
+        n_cols = len(rows[0])
+        return([
+            {
+                "range": f"{rowcol_to_a1(start_row + 1, 1)}:{rowcol_to_a1(end_row, n_cols)}",
+                "values": rows[start_row:end_row]
+            } for start_row, end_row in ranges
+        ])
+
+    def update(self, rows:list[list]):
+        self.header = rows[0]
+        self.row_hashes = [self.row_hash(row) for row in rows]
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from datetime import datetime
+import threading
+import json
+import time
+import os
+
+class RunReport:
+    STAGES = ("auth", "metadata", "fetch", "parse", "enrich", "write", "add-month")
+    REPORT_DIR = "reports"
+
+    def __init__(self):
+        """
+        Wall time per stage of each program's update. Stages nest (a fetch
+        inside parse), each stage is only charged its own time so the stage
+        totals add up to the time spent in stages. Safe to share between
+        threads, each thread tracks its own nesting
+        """
+        self.started = time.perf_counter()
+        self.started_at = datetime.now()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # spreadsheet_id:{stage:{"seconds": float, "count": int}}
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name:str, spreadsheet_id:str):
+        """
+        Time the block as the given stage for the spreadsheet
+
+            with run_report.stage("fetch", spreadsheet_id):
+                ...
+        """
+        assert name in self.STAGES, f"Unknown stage: {name}"
+        stack = self._local.__dict__.setdefault("stack", [])
+        # [name, nested stage time]
+        frame = [name, 0.0]
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+
+            with self._lock:
+                stage_timing = self.timings.setdefault(spreadsheet_id, {}).setdefault(
+                    name, {"seconds": 0.0, "count": 0}
+                )
+                stage_timing["seconds"] += elapsed - frame[1]
+                stage_timing["count"] += 1
+
+    def stage_totals(self) -> dict:
+        """stage:seconds summed over every spreadsheet"""
+        with self._lock:
+            return({
+                stage: round(sum([t.get(stage, {}).get("seconds", 0.0) for t in self.timings.values()]), 3)
+                for stage in self.STAGES
+            })
+
+    def build(self, **sections) -> dict:
+        """
+        Args:
+            sections: Other run stats included in the report as is, e.g. api_calls
+        """
+        totals = self.stage_totals()
+        with self._lock:
+            stages = {
+                spreadsheet_id: {
+                    stage: {"seconds": round(t["seconds"], 3), "count": t["count"]}
+                    for stage, t in spreadsheet_timings.items()
+                } for spreadsheet_id, spreadsheet_timings in self.timings.items()
+            }
+        return({
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stage_seconds": totals,
+            "stages": stages,
+            **sections
+        })
+
+    def write(self, path:str=None, **sections) -> str:
+        """
+        Write the report as JSON, to REPORT_DIR/run_<start time>.json by default
+
+        Returns:
+            str: Report path
+        """
+        if path is None:
+            path = os.path.join(self.REPORT_DIR, f"run_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as report_file:
+            json.dump(self.build(**sections), report_file, indent=2)
+        print(f"Performance report written to {path}")
+        return(path)
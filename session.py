@@ -21,6 +21,22 @@ class Session:
         "is_injured": False,
         "is_valid": False
     }
+    # No per-instance __dict__, a month's sessions are kept for the whole run
+    __slots__ = (
+        "status",
+        "session_data",
+        "empty_exercise_range",
+        "session_anchor",
+        "session_length",
+        "date",
+        "title",
+        "empty_ex",
+        "total_ex",
+        "incomplete_ex",
+        "exercises",
+        "date_str",
+        "day"
+    )
 
     def __init__(
         self, 
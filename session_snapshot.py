@@ -0,0 +1,87 @@
+import pickle
+import copy
+import os
+
+class SessionSnapshot:
+    CACHE_DIR = 'cache'
+    # Bump when Session's attributes change so older snapshots are ignored
+    VERSION = 2
+
+    def __init__(self, spreadsheet_id:str, cache_dir:str=None):
+        """
+        On-disk copy of the Session objects built for each month, keyed by
+        session anchor along with a hash of the session's block of cells.
+        A session whose block hashes the same as last run is reused rather
+        than rebuilt, so only sessions that were edited are parsed again
+
+        Args:
+            spreadsheet_id (str): Spreadsheet the snapshot belongs to
+            cache_dir (str, optional): Directory for snapshot files. Defaults to CACHE_DIR.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.snapshot_path = os.path.join(cache_dir or self.CACHE_DIR, f"{spreadsheet_id}.sessions.pickle")
+
+        # sheet_title:{session_anchor: (block_hash, Session)}
+        self.sheets = {}
+        # Sessions reused from / rebuilt since the loaded snapshot
+        self.reused = 0
+        self.rebuilt = 0
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "rb") as snapshot_file:
+                snapshot = pickle.load(snapshot_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            print(f"\tIgnoring unreadable session snapshot: {self.snapshot_path}")
+            return
+
+        if snapshot.get("version") == self.VERSION:
+            self.sheets = snapshot["sheets"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        # Write to a temporary file first so an interrupted run can't corrupt the snapshot
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            pickle.dump({"version": self.VERSION, "sheets": self.sheets}, snapshot_file)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def for_sheet(self, sheet_name:str):
+        """
+        Snapshot holding only the sheet's sessions with its own reuse counts,
+        for a month parsed on another thread or process. Merge it back with
+        merge()
+        """
+        sheet_view = copy.copy(self)
+        sheet_view.sheets = {sheet_name: dict(self.sheets.get(sheet_name, {}))}
+        sheet_view.reused = 0
+        sheet_view.rebuilt = 0
+        return(sheet_view)
+
+    def merge(self, sheet_view):
+        """Replace the sheets held by a for_sheet() view and add its counts"""
+        self.sheets.update(sheet_view.sheets)
+        self.reused += sheet_view.reused
+        self.rebuilt += sheet_view.rebuilt
+
+    def get(self, sheet_name:str, session_anchor:tuple, block_hash:str):
+        """The snapshot's Session at the anchor if its block is unchanged, else None"""
+        cached = self.sheets.get(sheet_name, {}).get(tuple(session_anchor))
+        if cached is None or cached[0] != block_hash:
+            return(None)
+        return(cached[1])
+
+    def update(self, sheet_name:str, session_anchors:list, block_hashes:list, sessions:list):
+        sheet = self.sheets.setdefault(sheet_name, {})
+        for session_anchor, block_hash, session in zip(session_anchors, block_hashes, sessions):
+            sheet[tuple(session_anchor)] = (block_hash, session)
+
+    def retain(self, sheet_name:str, session_anchors:list):
+        """Drop the sheet's sessions that are no longer at any of the anchors"""
+        keep = set([tuple(session_anchor) for session_anchor in session_anchors])
+        sheet = self.sheets.get(sheet_name, {})
+        self.sheets[sheet_name] = {k: v for k, v in sheet.items() if k in keep}
@@ -1,16 +1,52 @@
-from gspread_dataframe import set_with_dataframe
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+import multiprocessing
+import threading
+import queue
+from gspread.utils import ValueInputOption
+from dateutil.relativedelta import relativedelta
 from pandas import DataFrame
 from copy import deepcopy
-import gspread
-import calendar
 import re
 
+from session_snapshot import SessionSnapshot
+from row_snapshot import RowSnapshot
+from calendar_layout import CalendarLayout
+from layout_cache import LayoutCache
+from grid_cache import GridCache
 from month import Month
+from month_parser import parse_month
 from program_base import ProgramBase
 
 
 class Sheet(ProgramBase):
+    # Month layouts shared by every spreadsheet made from the same TEMPLATE
+    _layout_cache = LayoutCache()
+    # Months parsed at once, "process" or "thread" workers. A month parses in
+    # a few milliseconds and spawning a worker costs around a second, so
+    # months are parsed in-process unless more workers are asked for
+    PARSE_WORKERS = 1
+    PARSE_EXECUTOR = "process"
+    # Fewer months than this are parsed in-process even with workers
+    PARALLEL_PARSE_MIN_MONTHS = 48
+    # Worker pool shared by every program in the run, created on first use
+    _parse_executor = None
+    _parse_executor_lock = threading.Lock()
+    # Months per values.batchGet while prefetching, and most months fetched
+    # ahead of the parser
+    PREFETCH_CHUNK_SIZE = 6
+    PREFETCH_MONTHS = 12
+    # Reuse unchanged sessions from a pickled snapshot of the last run. Off
+    # by default, on 60 months parsing only saves ~20ms once the snapshot's
+    # load and save are paid for and it's slower than reparsing by 240
+    REUSE_SESSIONS = False
+    # Ignore the grid cache and re-read every month (--refresh_cache)
+    REFRESH_GRID_CACHE = False
+    # Once the spreadsheet's been edited, a cached month is only reused if
+    # it was fetched at least this long after the month ended, so sessions
+    # logged late (e.g. the last day's, on the 1st) are picked up
+    GRID_CACHE_GRACE_DAYS = 7
+
     def __init__(
         self, 
         program_name:str, 
@@ -37,8 +73,26 @@ class Sheet(ProgramBase):
         assert type(sheet_names) == list, \
            f"Please provide sheet_names separated by spaces. Given: {sheet_names}"
 
+        ### --- Load Cached Month Grids --- ###
+
+        # Months load from disk while the spreadsheet is unchanged since the
+        # last run, otherwise past months are reused if their structure matches
+        self.grid_cache = GridCache(self.spreadsheet_id)
+        if Sheet.REFRESH_GRID_CACHE:
+            self.grid_cache.invalidate()
+        self.modified_time = self.get_modified_time()
+        self.use_grid_cache = self.grid_cache.is_current(self.modified_time)
+        # Sessions from the last run, only edited sessions are rebuilt (opt-in)
+        self.session_snapshot = SessionSnapshot(self.spreadsheet_id) if Sheet.REUSE_SESSIONS else None
+
+        if self.use_grid_cache:
+            print("\tSpreadsheet unchanged since last run, loading months from cache")
+            self.sheet_ids = self.grid_cache.sheet_ids
+        else:
+            self.sheet_ids = self.get_sheet_ids()
+
         # Get sheets with implicit name (Any month that has YY format) to be parsed
-        all_sheet_titles = self.get_sheet_titles()
+        all_sheet_titles = list(self.sheet_ids.keys())
         
         explicit_format_months = [
             s for s in all_sheet_titles \
@@ -55,15 +109,17 @@ class Sheet(ProgramBase):
         else:
             parse_sheets = sheet_names
 
-        # Retrieve merge ranges only for sheets we'll actually parse
-        self.merged_ranges = self.retrieve_merge_ranges_for_sheets(parse_sheets)
-
         # Initialise month-instances dictionary
-        self.month_instances = self.parse_months(parse_sheets, clean_parsed_months)
+        with self.stage("parse"):
+            self.month_instances = self.parse_months(parse_sheets, clean_parsed_months)
     
     def write_to_sheet(self, df:DataFrame, tab_name:str):
         """
-        Write data frame to a worksheet
+        Write data frame to a worksheet. Rows are compared against the ones
+        written last run and only changed or appended rows are sent, in one
+        values.batchUpdate. The tab is cleared and rewritten in full when
+        there's no snapshot of it, its columns changed or it's been resized
+        since
 
         Args:
             df (DataFrame): DataFrame provided
@@ -71,9 +127,55 @@ class Sheet(ProgramBase):
         """
         # Select comment sheet
         worksheet = self.get_sheet(tab_name)
-        worksheet.clear()
-
-        set_with_dataframe(
+        row_snapshot = RowSnapshot(self.spreadsheet_id, tab_name)
+        with self.stage("write"):
+            rows = RowSnapshot.sheet_rows(df)
+            changed_ranges = None
+            if row_snapshot.matches_grid(worksheet.row_count, worksheet.col_count):
+                changed_ranges = row_snapshot.changed_ranges(rows)
+
+            if changed_ranges == [] and len(rows) == worksheet.row_count:
+                print(f"\tNo changes to write to {tab_name}")
+            else:
+                # Checked before writing, afterwards the logs write can't be
+                # told apart from anyone else's edit
+                keep_grid_cache = self.grid_cache_unchanged()
+
+                if changed_ranges is None:
+                    self.rewrite_sheet(worksheet, df)
+                else:
+                    print(f"\tWriting {sum([e - s for s, e in changed_ranges])} changed rows to {tab_name}")
+                    # Rows past the end are dropped, or made room for, as set_with_dataframe(resize=True) would
+                    if len(rows) != worksheet.row_count:
+                        self.call_api("write", "resize", worksheet.resize, rows=len(rows))
+                    if changed_ranges != []:
+                        self.call_api(
+                            "write",
+                            "values_batch_update",
+                            worksheet.batch_update,
+                            row_snapshot.value_ranges(rows, changed_ranges),
+                            value_input_option=ValueInputOption.user_entered
+                        )
+
+                # The logs tab isn't cached, keep the month grid cache valid for the next run
+                if keep_grid_cache:
+                    self.grid_cache.stamp(self.get_modified_time())
+
+        row_snapshot.update(rows)
+        row_snapshot.save()
+
+    def rewrite_sheet(self, worksheet, df:DataFrame):
+        """Clear the worksheet and write the whole data frame to it"""
+        from gspread_dataframe import set_with_dataframe
+
+        self.call_api("write", "clear", worksheet.clear)
+
+        # Resizes then updates the worksheet, both are safe to repeat on a retry
+        self.call_api(
+            "write",
+            "set_with_dataframe",
+            set_with_dataframe,
+            cost=2,
             worksheet=worksheet, 
             dataframe=df, 
             include_index=False,
@@ -81,6 +183,146 @@ class Sheet(ProgramBase):
             resize=True
         )
 
+    def grid_cache_unchanged(self) -> bool:
+        """
+        Whether the grid cache was stored from this run's reads and nothing
+        in the spreadsheet has been edited since. Checked right before the
+        run's own writes so the cache can be re-stamped after them
+        """
+        return(
+            self.grid_cache.modified_time == self.modified_time
+            and self.get_modified_time() == self.modified_time
+        )
+
+    def stream_month_grids(self, sheet_names:list):
+        """
+        Yield (sheet_name, values) for each month as soon as it's available.
+        Months reusable from the cache come first (reusable_cached_sheets), the rest
+        are fetched in the background a few months ahead of the caller, so
+        months are parsed while the next ones download. Freshly read months
+        are written back to the cache and self.merged_ranges is set once
+        every month has been yielded. Time spent waiting on a fetch counts
+        towards the "fetch" stage
+
+        Args:
+            sheet_names (list): Month sheet names
+        """
+        merged_ranges = {}
+        cached_sheets = self.reusable_cached_sheets(sheet_names)
+        fetch_sheets = [s for s in sheet_names if s not in cached_sheets]
+        for sheet_name in cached_sheets:
+            merged_ranges[sheet_name] = self.grid_cache.get_merges(sheet_name)
+            yield(sheet_name, self.grid_cache.get_values(sheet_name))
+
+        if fetch_sheets:
+            fetched_values = {}
+            fetched_at = datetime.now()
+            prefetched = queue.Queue(maxsize=self.PREFETCH_MONTHS)
+            stop = threading.Event()
+            producer = threading.Thread(
+                target=self.prefetch_month_grids,
+                args=(fetch_sheets, prefetched, stop),
+                daemon=True
+            )
+            producer.start()
+            try:
+                for _ in fetch_sheets:
+                    with self.stage("fetch"):
+                        fetched = prefetched.get()
+                    if isinstance(fetched, Exception):
+                        raise fetched
+                    sheet_name, values = fetched
+                    fetched_values[sheet_name] = values
+                    yield(sheet_name, values)
+            finally:
+                # Let the producer finish if the caller stopped early or failed
+                stop.set()
+                producer.join()
+
+            # Retrieve merge ranges only for sheets we'll actually parse
+            with self.stage("fetch"):
+                fetched_ranges = self.retrieve_merge_ranges_for_sheets(fetch_sheets)
+
+            self.grid_cache.store(
+                modified_time=self.modified_time,
+                sheet_ids=self.sheet_ids,
+                sheet_values=fetched_values,
+                merged_ranges=fetched_ranges,
+                grid_sizes={s: self.metadata.grid_size(s) for s in fetch_sheets},
+                fetched_at=fetched_at,
+                # Every cached month is still valid while the stamp matches
+                keep_sheets=self.grid_cache.titles if self.use_grid_cache else cached_sheets
+            )
+
+            merged_ranges.update(fetched_ranges)
+
+        self.merged_ranges = merged_ranges
+
+    def reusable_cached_sheets(self, sheet_names:list) -> list:
+        """
+        Months that can be served from the grid cache. Every cached month
+        while the spreadsheet is unchanged since the cache was stamped.
+        Otherwise only months fetched at least GRID_CACHE_GRACE_DAYS after
+        they ended, whose sheet ID, merges and grid size still match the
+        metadata snapshot. Later edits to those months need --refresh_cache
+
+        Args:
+            sheet_names (list): Month sheet names
+        """
+        if self.use_grid_cache:
+            return([s for s in sheet_names if self.grid_cache.has_sheet(s)])
+
+        def closed_when_fetched(sheet_name:str) -> bool:
+            fetched_at = self.grid_cache.get_fetched_at(sheet_name)
+            closed_at = datetime.strptime(sheet_name, "%b %y") + relativedelta(
+                months=1, days=self.GRID_CACHE_GRACE_DAYS
+            )
+            return(fetched_at is not None and fetched_at >= closed_at)
+
+        cached_sheets = [
+            s for s in sheet_names
+                if self.grid_cache.has_sheet(s)
+                and closed_when_fetched(s)
+                and self.grid_cache.matches_metadata(
+                    s,
+                    self.metadata.sheet_id(s),
+                    self.metadata.merges[s],
+                    self.metadata.grid_size(s)
+                )
+        ]
+        if cached_sheets:
+            print(f"\tSpreadsheet edited since last run, loading {len(cached_sheets)} past months from cache")
+        return(cached_sheets)
+
+    def prefetch_month_grids(self, sheet_names:list, prefetched:queue.Queue, stop:threading.Event):
+        """
+        Fetch month values PREFETCH_CHUNK_SIZE sheets per request onto the
+        bounded prefetched queue, blocking while it's full. An error is put
+        on the queue for the consumer to raise
+
+        Args:
+            sheet_names (list): Month sheet names to fetch, in order
+            prefetched (queue.Queue): (sheet_name, values) per month
+            stop (threading.Event): Set when the consumer no longer needs values
+        """
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    prefetched.put(item, timeout=0.1)
+                    return(True)
+                except queue.Full:
+                    continue
+            return(False)
+
+        try:
+            for chunk_start in range(0, len(sheet_names), self.PREFETCH_CHUNK_SIZE):
+                chunk_names = sheet_names[chunk_start:chunk_start+self.PREFETCH_CHUNK_SIZE]
+                for sheet_name, values in self.batch_get_sheet_values(chunk_names).items():
+                    if not put((sheet_name, values)):
+                        return
+        except Exception as error:
+            put(error)
+
     def parse_months(
         self, 
         parse_sheets:tuple[str], 
@@ -101,195 +343,260 @@ class Sheet(ProgramBase):
         # Sort sheets by date (format: "Mon YY" e.g., "Jan 24")
         sorted_sheets = sorted(parse_sheets, key=lambda x: datetime.strptime(x, "%b %y"))
 
+        # Parse each month's raw data as it arrives, from the grid cache where
+        # possible, while the following months are fetched. Across worker
+        # processes for longer histories
+        parsed_months = self.parse_month_grids(
+            sorted_sheets,
+            self.stream_month_grids(sorted_sheets)
+        )
+
         for month_sheet_name in sorted_sheets:
             print(f"\n\tParsing Sheet: {month_sheet_name}", end=". ")
-            # Get raw month data
-            month_data = self.get_sheet(month_sheet_name).get_all_values()
             # Get merged ranges for this sheet
             month_merged_ranges = self.merged_ranges[month_sheet_name]
 
             month_instance = Month(
-                data=month_data,
+                data=None,
                 spreadsheet_id=self.spreadsheet_id,
                 sheet_name=month_sheet_name,
-                merged_ranges=month_merged_ranges
+                merged_ranges=month_merged_ranges,
+                sheet_id=self.sheet_ids[month_sheet_name],
+                parsed=parsed_months[month_sheet_name]
             )
 
             ### --- Clean Month Sheets By Merging Unused Cells --- ###
 
             if clean_parsed_months:
-                # Clean the months by merging unused cells and prettifying the program
-                month_instance.clean_sessions()
+                # Clean the months by merging unused cells and prettifying the program,
+                # sending the month's formatting requests in one batch
+                with month_instance.buffered_requests():
+                    month_instance.clean_sessions()
+                # Cleaning edits the month, re-read it next run
+                self.grid_cache.invalidate([month_sheet_name])
 
             month_instances[month_sheet_name] = month_instance
 
+        if self.session_snapshot is not None:
+            print(
+                f"\n\tSessions reused from last run: {self.session_snapshot.reused}, "
+                f"rebuilt: {self.session_snapshot.rebuilt}"
+            )
+            self.session_snapshot.save()
+        Sheet._layout_cache.save()
+
         return(month_instances)
     
-    def process_new_month(self, new_month_ws:gspread.Worksheet, sheet_name:str) -> Month:
+    @classmethod
+    def get_parse_executor(cls):
+        """
+        The run's pool of PARSE_WORKERS processes (or threads), shared by
+        every program so concurrent programs don't each start their own.
+        None when months are parsed in-process
+        """
+        if cls.PARSE_WORKERS <= 1:
+            return(None)
+        with cls._parse_executor_lock:
+            if cls._parse_executor is None:
+                if cls.PARSE_EXECUTOR == "process":
+                    # Spawned rather than forked, other programs' threads may hold locks
+                    cls._parse_executor = ProcessPoolExecutor(
+                        cls.PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    cls._parse_executor = ThreadPoolExecutor(cls.PARSE_WORKERS)
+            return(cls._parse_executor)
+
+    @classmethod
+    def shutdown_parse_executor(cls):
+        with cls._parse_executor_lock:
+            if cls._parse_executor is not None:
+                cls._parse_executor.shutdown()
+                cls._parse_executor = None
+
+    def parse_month_grids(self, sheet_names:list, month_grids) -> dict:
+        """
+        Parse each month's values into its layout and sessions as they
+        arrive, in-process unless PARSE_WORKERS asks for the shared worker
+        pool and there are enough months. Months parsed in-process or on
+        threads share the layout cache, so a layout found for one month is
+        used by later months with the same weekday and length. Worker
+        processes get a view of it when their month is submitted, merged
+        back as soon as the month is parsed. Each month gets its own view
+        of the session snapshot, merged back in sheet order
+
+        Args:
+            sheet_names (list): Month sheet names, in the order to merge
+            month_grids (Iterable): (sheet_name, values) for every month, in
+                any order, e.g. from stream_month_grids
+
+        Returns:
+            dict: sheet_name:MonthParser
+        """
+        def snapshot_view(sheet_name:str) -> SessionSnapshot:
+            if self.session_snapshot is None:
+                return(None)
+            return(self.session_snapshot.for_sheet(sheet_name))
+
+        def merge_layouts(future):
+            if future.exception() is None:
+                Sheet._layout_cache.merge(future.result().layout_cache)
+
+        executor = None
+        if len(sheet_names) >= Sheet.PARALLEL_PARSE_MIN_MONTHS:
+            executor = Sheet.get_parse_executor()
+
+        if executor is None:
+            parsed_months = {
+                sheet_name: parse_month(values, sheet_name, snapshot_view(sheet_name), Sheet._layout_cache)
+                for sheet_name, values in month_grids
+            }
+        else:
+            in_process = isinstance(executor, ThreadPoolExecutor)
+            futures = {}
+            for sheet_name, values in month_grids:
+                layout_cache = Sheet._layout_cache if in_process else Sheet._layout_cache.view()
+                future = executor.submit(parse_month, values, sheet_name, snapshot_view(sheet_name), layout_cache)
+                if not in_process:
+                    future.add_done_callback(merge_layouts)
+                futures[sheet_name] = future
+            parsed_months = {sheet_name: futures[sheet_name].result() for sheet_name in sheet_names}
+
+        if self.session_snapshot is not None:
+            for sheet_name in sheet_names:
+                self.session_snapshot.merge(parsed_months[sheet_name].session_snapshot)
+        return(parsed_months)
+
+    def process_new_month(self, sheet_name:str, sheet_id:int) -> Month:
         """
         Process a new month by creating a new Month instance for it
 
         Args:
             sheet_name (str): Name of the sheet to process
+            sheet_id (int): Tab-specific sheet ID of the new sheet
         """
 
         print(f"\t\tProcessing New Month: {sheet_name}")
-        # Get raw month data
-        month_data = new_month_ws.get_values()
+        # Get raw month data, straight from values.batchGet without a worksheet lookup
+        month_data = self.batch_get_sheet_values([sheet_name])[sheet_name]
         # Initialise Month instance to get merged ranges for this sheet
         month_instance = Month(
             data=month_data,
             spreadsheet_id=self.spreadsheet_id,
             sheet_name=sheet_name,
             merged_ranges=None,
-            pre_processed=False
+            pre_processed=False,
+            sheet_id=sheet_id,
+            layout_cache=Sheet._layout_cache
         )
+        Sheet._layout_cache.save()
 
         return(month_instance)
         
     def add_new_month(self, new_month:datetime, clean=True):
-        print(f"\n\tAdding New Month: {new_month.strftime('%b %y')}")
-        all_sheets = self.get_sheet_titles()
-        
-        new_month_meta = {
-            "sheet_name": new_month.strftime("%b %y"),
-            "month_datetime": new_month,
-        }
+        self.add_new_months([new_month], clean)
 
-        # Duplicate template
-        template_ws = self.get_sheet('TEMPLATE')
-        template_ws.duplicate(
-            insert_sheet_index=len(all_sheets), 
-            new_sheet_name=new_month_meta["sheet_name"]
-        )
+    def add_new_months(self, new_months:list[datetime], clean=True):
+        with self.stage("add-month"):
+            self._add_new_months(new_months, clean)
 
-        # Invalidate cached worksheet list since we just added a new sheet
-        self.invalidate_worksheet_cache()
-        self.invalidate_merge_ranges_cache()
+    def next_sheet_id(self) -> int:
+        """Unused sheet ID for a new sheet, so it's known before the sheet exists"""
+        return(max([0, *self.get_sheet_ids().values()]) + 1)
 
-        # Initialise duplicated sheet
-        new_ws = self.get_sheet(new_month_meta["sheet_name"])
-        # Find what day the start of the month is and update day 1 accordingly
-        # other Month days will follow through
-        first_day = new_month.replace(day=1).weekday()
-        # Map weekdays to  column values
-        day_mapping = {
-            # Weekday index : column index in template
-            0: "D", # Monday
-            1: "F", # Tuesday
-            2: "H", # Wednesday
-            3: "J", # Thursday
-            4: "L", # Friday
-            5: "N", # Saturday
-            6: "B", # Sunday
-        }
+    def template_checksum(self) -> str:
+        """
+        Checksum of the TEMPLATE's values, changes with any edit to the
+        TEMPLATE including to its session length
+        """
+        return(GridCache.checksum(self.batch_get_sheet_values(["TEMPLATE"])["TEMPLATE"]))
 
-        # Set day 1
-        new_ws.update([[1]], f"{day_mapping[first_day]}4")
-        # Give the template a title
-        new_ws.update([[new_month.strftime("%B %Y")]], "B2")
-        # Give the template weeknumbers
-        new_ws.update([[int(new_month.replace(day=1).strftime("%V"))]], "A5")
-
-        # Add it to the month_instances dictionary to get month_instances variables
-        new_month_inst = self.process_new_month(
-            new_ws, 
-            sheet_name=new_month_meta["sheet_name"]
-        )
+    def _add_new_months(self, new_months:list[datetime], clean:bool):
+        new_sheet_names = [m.strftime("%b %y") for m in new_months]
+        print(f"\n\tAdding New Months: {', '.join(new_sheet_names)}")
+        all_sheets = self.get_sheet_titles()
+        template_sheet_id = self.get_sheet_ids()["TEMPLATE"]
+        # New sheets' IDs chosen up front so they can be filled in and
+        # cleaned in the same batch they're created in
+        first_sheet_id = self.next_sheet_id()
+        new_sheet_ids = {
+            sheet_name: first_sheet_id + i for i, sheet_name in enumerate(new_sheet_names)
+        }
         if clean:
-            # Clean 'book end' days of the new sheet
-            self.clean_new_month(
-                new_month_inst,
-                first_day_index=first_day
-            )
-
-        self.month_instances[new_month_meta["sheet_name"]] = new_month_inst
-
-    @staticmethod
-    def get_week_number(date: datetime):
-        first_day = date.replace(day=1)
-        first_weekday = (first_day.weekday() + 1) % 7  
-        # Day offset within the first week
-        adjusted_day = first_weekday + date.day - 1
-        week_number = (adjusted_day // 7) + 1
-        return week_number
-    
-    def clean_new_month(self, new_month_instance:str, first_day_index:int):
-        print("\t\tCleaning new month")
-
-        ### ---  Remove unnecessary pre days --- ###
-
-        # Use the location of first day and length of sessions to merge first week cells
-        session_length = new_month_instance.session_length
-
-        first_session_col = 1
-        first_session_row = 3 # Merge the date cell too
-        final_session_row = session_length + 3
-        final_session_col = new_month_instance.day1_column_index
-
-        # Sundays require no removal of prior days
-        if first_day_index != 6:
-            self.merge_cells(
-                sheet_id=new_month_instance.sheet_id,
-                start_row=first_session_row,
-                end_row=final_session_row,
-                start_col=first_session_col,
-                end_col=final_session_col,
-                colour={"red":1, "green":0.976, "blue":0.905},
-                remove_data_validation=False,
-                new_value=" ",
-                sheet_name=new_month_instance.sheet_name,
-                colour_borders=True
-            )
-
-        ### --- Remove Unnecessary Post Days --- ###
-
-        ## -- Remove End of Final Week -- ##
-
-        # Get the datetime object for the month given the sheet name
-        month_dt_obj = datetime.strptime(new_month_instance.sheet_name, "%b %y")
-        # Get the final day of the month
-        month_final_day = calendar.monthrange(month_dt_obj.year, month_dt_obj.month)[1]
-        # Set the date to the final day of the month for efficiency below
-        month_final_day_dt_obj = month_dt_obj.replace(day=month_final_day)
-        # Get the week number of the final day so we can find the row number it sits on
-        final_week_number = self.get_week_number(month_final_day_dt_obj)
-        fw_row_number = ((final_week_number-1)*session_length) + 4
+            # Session length of months made from the TEMPLATE as it is now
+            template_checksum = self.template_checksum()
+            session_length = Sheet._layout_cache.get_session_length(template_checksum)
+
+        with self.buffered_requests(max_requests=len(new_months)*self.REQUEST_BUFFER_LIMIT):
+            for i, (new_month, sheet_name) in enumerate(zip(new_months, new_sheet_names)):
+                new_sheet_id = new_sheet_ids[sheet_name]
+                requests = [
+                    # Duplicate template
+                    {
+                        "duplicateSheet": {
+                            "sourceSheetId": template_sheet_id,
+                            "insertSheetIndex": len(all_sheets) + i,
+                            "newSheetId": new_sheet_id,
+                            "newSheetName": sheet_name
+                        }
+                    }
+                ]
+                # Set day 1, the title and the first week number, the
+                # TEMPLATE fills in the rest
+                for row, col, value in CalendarLayout.template_values(new_month):
+                    requests.append(self.get_update_cell_request(new_sheet_id, row, col, value))
+                self.queue_requests(requests)
+
+            if clean and session_length is None:
+                # No month has been read since the TEMPLATE last changed, send
+                # the new sheets and read the first back to find it
+                self.flush_requests()
+                self.invalidate_worksheet_cache()
+                session_length = self.process_new_month(
+                    sheet_name=new_sheet_names[0],
+                    sheet_id=new_sheet_ids[new_sheet_names[0]]
+                ).session_length
+                Sheet._layout_cache.put_session_length(template_checksum, session_length)
+                Sheet._layout_cache.save()
+
+            if clean:
+                # Clean 'book end' days of the new sheets in the same batch
+                for new_month, sheet_name in zip(new_months, new_sheet_names):
+                    self.clean_new_month(
+                        sheet_id=new_sheet_ids[sheet_name],
+                        sheet_name=sheet_name,
+                        layout=CalendarLayout(new_month, session_length)
+                    )
+
+        # Invalidate cached worksheet list since we just added new sheets
+        self.invalidate_worksheet_cache()
+        self.invalidate_merge_ranges_cache()
+        # Months already cached are untouched, the stale stamp has them re-checked
+        self.grid_cache.invalidate(new_sheet_names)
+        self.sheet_ids = {**self.sheet_ids, **new_sheet_ids}
 
-        # If final day is a Saturday, no cells to merge this month
-        if month_final_day_dt_obj.weekday() != 5:
-            final_session_col = new_month_instance.find_dayx(row_num=fw_row_number, day_num=month_final_day)
-            
-            self.merge_cells(
-                sheet_id=new_month_instance.sheet_id,
-                start_row=fw_row_number-1,
-                end_row=fw_row_number+session_length-1, # 0 indexed rows
-                start_col=final_session_col+2, # We want to merge the day after the final day
-                end_col=15, # Always going to be the right-most column
-                colour={"red":1, "green":0.976, "blue":0.905},
-                remove_data_validation=False,
-                new_value=" ",
-                sheet_name=new_month_instance.sheet_name,
-                colour_borders=True
-            )
+    def clean_new_month(self, sheet_id:int, sheet_name:str, layout:CalendarLayout):
+        """
+        Blank out the sessions outside the month: merge and colour the days
+        before the 1st, the days after the final day and any spare weeks
 
-        ## -- Remove Remaining Whole Weeks -- ##
+        Args:
+            sheet_id (int): Tab-specific sheet ID of the new month
+            sheet_name (str): Name of the new month's sheet
+            layout (CalendarLayout): Layout of the new month
+        """
+        print(f"\t\tCleaning new month: {sheet_name}")
 
-        # Set current week to be the week after the final week row number
-        current_row_number = fw_row_number + session_length - 1
-        if current_row_number < 54:
+        for start_row, end_row, start_col, end_col in layout.book_end_ranges():
             self.merge_cells(
-                sheet_id=new_month_instance.sheet_id,
-                start_row=current_row_number,
-                end_row=63,
-                start_col=1,
-                end_col=15, # Always going to be the right-most column
+                sheet_id=sheet_id,
+                start_row=start_row,
+                end_row=end_row,
+                start_col=start_col,
+                end_col=end_col,
                 colour={"red":1, "green":0.976, "blue":0.905},
                 remove_data_validation=False,
                 new_value=" ",
-                sheet_name=new_month_instance.sheet_name,
+                sheet_name=sheet_name,
                 colour_borders=True
             )
-            current_row_number += session_length + 1
-
-        return(new_month_instance)
\ No newline at end of file
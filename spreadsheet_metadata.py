@@ -0,0 +1,54 @@
+class SpreadsheetMetadata:
+    # Only the sheet metadata we use, no cell data
+    FIELDS = "sheets(properties,merges,conditionalFormats)"
+
+    def __init__(self, sheets:list):
+        """
+        Snapshot of every sheet's properties, merges and conditional formats,
+        loaded with a single spreadsheets.get so sheet IDs, titles, grid
+        sizes and merges are looked up locally
+
+        Args:
+            sheets (list): "sheets" list of a spreadsheets.get response
+        """
+        # Keep the spreadsheet's tab order
+        sorted_sheets = sorted(sheets, key=lambda s: s['properties'].get('index', 0))
+        self.sheets = {s['properties']['title']: s for s in sorted_sheets}
+        self._titles_by_id = {
+            s['properties']['sheetId']: title for title, s in self.sheets.items()
+        }
+
+    @property
+    def titles(self) -> list[str]:
+        return(list(self.sheets.keys()))
+
+    @property
+    def sheet_ids(self) -> dict:
+        """sheet_title:sheet_id"""
+        return({title: s['properties']['sheetId'] for title, s in self.sheets.items()})
+
+    @property
+    def sheet_properties(self) -> list[dict]:
+        return([s['properties'] for s in self.sheets.values()])
+
+    @property
+    def merges(self) -> dict:
+        """sheet_title:merge_ranges"""
+        return({title: s.get('merges', []) for title, s in self.sheets.items()})
+
+    def sheet_id(self, sheet_name:str) -> int:
+        try:
+            return(self.sheets[sheet_name]['properties']['sheetId'])
+        except KeyError:
+            raise KeyError(f"Sheet not found in spreadsheet metadata: {sheet_name}")
+
+    def grid_size(self, sheet_name:str) -> tuple[int, int]:
+        """(row_count, column_count) of the sheet"""
+        grid = self.sheets[sheet_name]['properties'].get('gridProperties', {})
+        return((grid.get('rowCount', 0), grid.get('columnCount', 0)))
+
+    def conditional_formats(self, sheet_id:int) -> list:
+        title = self._titles_by_id.get(sheet_id)
+        if title is None:
+            return([])
+        return(self.sheets[title].get('conditionalFormats', []))
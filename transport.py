@@ -0,0 +1,256 @@
+from google.auth.transport.requests import AuthorizedSession, Request
+from gspread.utils import convert_credentials
+from requests.adapters import HTTPAdapter
+from requests.hooks import dispatch_hook
+from datetime import timedelta
+import threading
+import httplib2
+import requests
+import gspread
+import time
+
+from cassette import Cassette
+from fake_sheets import FakeSheets
+import discovery
+
+class HandlerSession(requests.Session):
+    def __init__(self, handler):
+        """
+        requests session that passes every request to an offline
+        handler(method, url, params, body) -> (status, headers, content)
+        rather than the network
+        """
+        super().__init__()
+        self.handler = handler
+
+    def request(self, method, url, params=None, data=None, headers=None, json=None, **kwargs):
+        start = time.perf_counter()
+        status, response_headers, content = self.handler(method, url, params, json if json is not None else data)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(response_headers)
+        response._content = content
+        response.url = url
+        response.encoding = "utf-8"
+        response.elapsed = timedelta(seconds=time.perf_counter() - start)
+        response.request = requests.Request(method, url, params=params, data=data, json=json).prepare()
+        # Response hooks (e.g. ApiMetrics) run as they would for a live session
+        return(dispatch_hook("response", self.hooks, response))
+
+class RecordingSession(AuthorizedSession):
+    def __init__(self, credentials, cassette:Cassette):
+        """Authorised session recording each request to the cassette"""
+        super().__init__(credentials)
+        self.cassette = cassette
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        response = super().request(method, url, data=data, headers=headers, **kwargs)
+        body = kwargs.get("json") if kwargs.get("json") is not None else data
+        self.cassette.record(
+            method, url, kwargs.get("params"), body,
+            response.status_code, response.headers, response.content
+        )
+        return(response)
+
+class SessionHttp:
+    def __init__(self, session:requests.Session):
+        """
+        httplib2.Http interface over a requests session, so the discovery
+        service shares gspread's token and connection pool
+        """
+        self.session = session
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        response = self.session.request(method, uri, data=body, headers=headers)
+        # requests has already decoded the content, like httplib2 would
+        response_headers = {
+            k.lower(): v for k, v in response.headers.items() if k.lower() != "content-encoding"
+        }
+        return((httplib2.Response({**response_headers, "status": response.status_code}), response.content))
+
+    def close(self):
+        pass
+
+class ThreadLocalSession:
+    def __init__(self, build_session, credentials=None, adapter:HTTPAdapter=None, response_hooks:list=None):
+        """
+        Stands in for a requests session, giving each thread its own. requests
+        doesn't make Session safe to share between threads (cookies, adapter
+        mounts and auth state live on it), so threads only share what is:
+        the credentials, refreshed under a lock, and the urllib3 connection
+        pool behind one HTTPAdapter
+
+        Args:
+            build_session (callable): build_session(credentials) -> session
+                for a thread
+            credentials (google.auth.credentials.Credentials, optional):
+                Shared by every thread's session. Defaults to None.
+            adapter (HTTPAdapter, optional): Mounted for https:// on every
+                thread's session. Defaults to None.
+            response_hooks (list, optional): requests response hooks added to
+                every thread's session. Defaults to None.
+        """
+        self.build_session = build_session
+        self.credentials = credentials
+        self.adapter = adapter
+        self.response_hooks = response_hooks or []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's session, created on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self.build_session(self.credentials)
+            if self.adapter is not None:
+                session.mount("https://", self.adapter)
+            session.hooks["response"].extend(self.response_hooks)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return(session)
+
+    def refresh_credentials(self):
+        """
+        Fetch a new access token if the current one has expired, one thread
+        at a time, so the sessions find a valid token rather than each
+        refreshing it
+        """
+        if self.credentials is None:
+            return
+        with self._lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+
+    def request(self, method, url, **kwargs):
+        self.refresh_credentials()
+        return(self.session.request(method, url, **kwargs))
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._local = threading.local()
+
+class LiveTransport:
+    # Whether build_clients needs the service account credentials
+    needs_credentials = True
+    # Most open connections kept per host, enough for every program thread
+    POOL_SIZE = 10
+
+    def __init__(self):
+        """
+        Builds every context's API clients over one ThreadLocalSession, each
+        thread (programs and the month prefetcher) making requests through
+        its own authorised session. The access token is fetched once and
+        refreshed when it expires, and connections are kept alive in one
+        pool shared by both clients and every program in the run
+        """
+        self._session = None
+        self._lock = threading.Lock()
+
+    def build_credentials(self, creds):
+        """Credentials shared by every thread's session"""
+        return(convert_credentials(creds))
+
+    def build_adapter(self) -> HTTPAdapter:
+        """Connection pool shared by every thread's session"""
+        return(HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE))
+
+    def build_session(self, credentials) -> requests.Session:
+        """Authorised requests session for one thread"""
+        return(AuthorizedSession(credentials))
+
+    def get_session(self, creds, metrics=None) -> ThreadLocalSession:
+        """The run's shared session, created on first use"""
+        with self._lock:
+            if self._session is None:
+                session = ThreadLocalSession(
+                    self.build_session,
+                    self.build_credentials(creds),
+                    self.build_adapter(),
+                    [metrics.on_response] if metrics is not None else []
+                )
+                # Fetch the token now rather than on each thread's first request
+                session.refresh_credentials()
+                self._session = session
+            return(self._session)
+
+    def build_clients(self, creds, metrics=None) -> tuple:
+        """
+        Build a gspread client and the Sheets discovery service, both over
+        the shared session. The clients are per context, only the token and
+        connections are shared
+
+        Args:
+            creds (ServiceAccountCredentials): Google API credentials
+            metrics (ApiMetrics, optional): Records every request made by
+                either client. Defaults to None.
+
+        Returns:
+            tuple: (discovery service, gspread client)
+        """
+        session = self.get_session(creds, metrics)
+
+        # Service object to apply conditional formatting, built offline from
+        # the bundled discovery document
+        service = discovery.build_service(SessionHttp(session))
+        # Authorise Google Cloud access
+        gc = gspread.Client(auth=None, session=session)
+        return((service, gc))
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                if self._session.adapter is not None:
+                    self._session.adapter.close()
+                self._session = None
+
+class RecordingTransport(LiveTransport):
+    def __init__(self, cassette_path:str):
+        """Live API clients that record every request and response to a cassette"""
+        super().__init__()
+        self.cassette = Cassette(cassette_path)
+
+    def build_session(self, credentials) -> requests.Session:
+        return(RecordingSession(credentials, self.cassette))
+
+    def close(self):
+        super().close()
+        self.cassette.save()
+
+class OfflineTransport(LiveTransport):
+    needs_credentials = False
+
+    def __init__(self, handler):
+        """
+        API clients that never touch the network, every request is served by
+        handler(method, url, params, body) -> (status, headers, content)
+        """
+        super().__init__()
+        self.handler = handler
+
+    def build_credentials(self, creds):
+        return(None)
+
+    def build_adapter(self) -> HTTPAdapter:
+        return(None)
+
+    def build_session(self, credentials) -> requests.Session:
+        return(HandlerSession(self.handler))
+
+class ReplayTransport(OfflineTransport):
+    def __init__(self, cassette_path:str):
+        """Serve every request from a recorded cassette"""
+        self.cassette = Cassette.load(cassette_path)
+        super().__init__(self.cassette.play)
+
+class FakeTransport(OfflineTransport):
+    def __init__(self, fixture_path:str):
+        """Serve every request from an in-memory FakeSheets seeded with a fixture"""
+        self.fake_sheets = FakeSheets.load(fixture_path)
+        super().__init__(self.fake_sheets.handle)